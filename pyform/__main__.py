@@ -0,0 +1,81 @@
+"""Production launcher of the pyform server.
+
+    python -m pyform serve --workers 4
+
+The launcher imports the server once, compiles the render plans of every
+registered form into a store file and runs the workers, which map the store
+read-only instead of compiling the plans themselves.
+
+Each worker keeps its own metrics, /metrics serves those of the worker
+answering the scrape, labelled worker="<pid>".
+"""
+import argparse
+import os
+import shutil
+import sys
+from pathlib import Path
+from tempfile import mkdtemp
+
+BASE_PATH = Path(__file__).resolve().parent
+
+
+def prepare_store(path:Path=None)->Path:
+    """Compiles the plans of the forms the server registers into the store at path
+
+    Without a path, nor config.FORM_STORE_PATH, the store is written to a
+    directory only this user can access, made for this run.
+    """
+    if str(BASE_PATH) not in sys.path:
+        sys.path.insert(0, str(BASE_PATH))
+    import config
+    import server
+    from pyform.models.form_store import write_store
+    from pyform.models.registry import warm_up
+    path = path or config.FORM_STORE_PATH
+    path = Path(path) if path else Path(mkdtemp(prefix='pyform-')) / 'forms.store'
+    warm_up(**server.FORM_FLAGS)
+    write_store(path)
+    return path
+
+
+def serve(workers:int=None, host:str=None, port:int=None, store:Path=None, debug:bool=False):
+    import uvicorn
+    os.environ['PYFORM_DEBUG'] = '1' if debug else '0'
+    from pyform.models.form_store import STORE_ENV
+    from pyform.models.metrics import WORKERS_ENV
+    path = prepare_store(store)
+    import config
+    # the workers are spawned processes, they find the store through the environment
+    os.environ[STORE_ENV] = str(path)
+    workers = workers or config.WORKERS
+    os.environ[WORKERS_ENV] = str(workers)
+    try:
+        uvicorn.run(
+            "server:app",
+            app_dir=str(BASE_PATH),
+            host=host or config.NETWORK_CONFIG.get('host'),
+            port=port or config.NETWORK_CONFIG.get('port'),
+            workers=workers,
+            )
+    finally:
+        if not (store or config.FORM_STORE_PATH):
+            # the private directory of this run
+            shutil.rmtree(path.parent, ignore_errors=True)
+
+
+def main(argv:list=None):
+    parser = argparse.ArgumentParser(prog='python -m pyform', description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('serve', help='run the server with several worker processes')
+    command.add_argument('--workers', type=int, help='number of worker processes, defaults to config.WORKERS')
+    command.add_argument('--host', help='defaults to the host of config.NETWORK_CONFIG')
+    command.add_argument('--port', type=int, help='defaults to the port of config.NETWORK_CONFIG')
+    command.add_argument('--store', type=Path, help='path of the precompiled form store, defaults to config.FORM_STORE_PATH or a private file per run')
+    command.add_argument('--debug', action='store_true', help='run the app in debug mode')
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        serve(workers=args.workers, host=args.host, port=args.port, store=args.store, debug=args.debug)
+
+
+if __name__ == '__main__':
+    main()
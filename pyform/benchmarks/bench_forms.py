@@ -0,0 +1,226 @@
+"""Benchmarks of ModelForm rendering and validation at scale.
+
+Synthetic ModelForm subclasses are generated with a given number of fields,
+nesting depth and select options, then timed and measured. Results are
+written as json and can be compared against a stored baseline:
+
+    python -m pyform.benchmarks.bench_forms --output results.json
+    python -m pyform.benchmarks.bench_forms --baseline pyform/benchmarks/baseline.json --threshold 1.5
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+import pydantic
+from pydantic import BaseModel, Field, create_model
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+try:
+    from pyform.models.form_models import ModelForm
+    from pyform.models.form_state import FormState
+except ImportError:
+    from models.form_models import ModelForm
+    from models.form_state import FormState
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+
+class Scenario(NamedTuple):
+    fields: int
+    depth: int = 0
+    options: int = 10
+
+    @property
+    def name(self)->str:
+        return f"fields{self.fields}-depth{self.depth}-options{self.options}"
+
+
+SCENARIOS = (
+    Scenario(10),
+    Scenario(100),
+    Scenario(1000),
+    Scenario(100, depth=1),
+    Scenario(100, depth=3),
+    Scenario(100, options=1000),
+    )
+QUICK_SCENARIOS = (Scenario(10), Scenario(100, depth=1))
+
+
+def field_definitions(count:int, options:int, prefix:str='f')->dict:
+    """Field definitions cycling through the input kinds the renderer supports"""
+    choices:list = [f"option {number}" for number in range(options)]
+    fields:dict = {}
+    for number in range(count):
+        name = f"{prefix}{number}"
+        kind = number % 5
+        if kind == 0:
+            fields[name] = (str, Field(default=None, min_length=2, max_length=50, title=name.title(), json_schema_extra={'icon': 'user'}))
+        elif kind == 1:
+            fields[name] = (int, Field(default=None, gt=0, le=1000, title=name.title()))
+        elif kind == 2:
+            fields[name] = (bool, Field(default=False, title=name.title()))
+        elif kind == 3:
+            fields[name] = (Any, Field(default=None, title=name.title(), json_schema_extra={'options': choices}))
+        else:
+            fields[name] = (Any, Field(default=0, title=name.title(), json_schema_extra={'range': True, 'min': 0, 'max': 10, 'step': 1}))
+    return fields
+
+
+def build_form(scenario:Scenario)->type:
+    """Builds a ModelForm subclass for a scenario.
+
+    The fields are split evenly between the form and a chain of depth nested models.
+    """
+    per_level:int = scenario.fields // (scenario.depth + 1)
+    nested:Optional[type] = None
+    for level in range(scenario.depth, 0, -1):
+        fields = field_definitions(per_level, scenario.options, prefix=f"n{level}_")
+        if nested is not None:
+            fields[f"sub{level + 1}"] = (nested, nested.model_construct())
+        nested = create_model(f"Nested{level}", __base__=BaseModel, **fields)
+    fields = field_definitions(scenario.fields - per_level * scenario.depth, scenario.options)
+    if nested is not None:
+        fields['sub1'] = (nested, nested.model_construct())
+    return create_model(f"Bench{scenario.fields}x{scenario.depth}x{scenario.options}", __base__=ModelForm, **fields)
+
+
+def form_data(model:type)->dict:
+    """Valid form data for the generated fields a model's form exposes"""
+    data:dict = {'csrf': 'bench'}
+    for key in model.form_layout().paths:
+        kind = int(key.rsplit('.', 1)[-1].rsplit('_', 1)[-1].lstrip('f')) % 5
+        data[key] = ('value', '5', 'true', 'option 0', '3')[kind]
+    return data
+
+
+def measure(function:Callable, number:int=10, repeat:int=5, round_time:float=0.02)->float:
+    """Best seconds per call over repeat rounds.
+
+    A round makes at least number calls and lasts at least round_time, the
+    best round is the least disturbed by the rest of the machine.
+    """
+    function()
+    start = time.perf_counter()
+    function()
+    single:float = max(time.perf_counter() - start, 1e-9)
+    number = max(number, int(round_time / single))
+    rounds:list = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        rounds.append((time.perf_counter() - start) / number)
+    return min(rounds)
+
+
+def peak_memory(function:Callable)->int:
+    """Peak bytes allocated by a call"""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def stream_body(loop:asyncio.AbstractEventLoop, model:ModelForm, form:FormState)->bytes:
+    async def collect():
+        response = model.stream_html_form(post='/form', target='form', insert=True, form=form)
+        return b''.join([chunk async for chunk in response.body_iterator])
+    return loop.run_until_complete(collect())
+
+
+def run_scenario(scenario:Scenario, number:int)->dict:
+    model_class:type = build_form(scenario)
+    model:ModelForm = model_class.model_construct()
+    form:FormState = model.data_form()
+    flags:dict = {'post': '/form', 'target': 'form', 'insert': True}
+
+    async def post(request):
+        return await model.validateForm(request=request, schema=model_class)
+
+    client = TestClient(Starlette(routes=[Route('/form', post, methods=['POST'])]))
+    data:dict = form_data(model_class)
+    validate_rate:float = 1 / measure(lambda: client.post('/form', data=data), number)
+    # an int input, checked by the inline validation
+    field:str = next(key for key, value in data.items() if value == '5')
+
+    loop = asyncio.new_event_loop()
+    try:
+        return {
+            'generate_html_form': measure(lambda: ''.join(model.generate_html_form(form=form, **flags)), number),
+            'html_form': measure(lambda: model.html_form(form=form, **flags), number),
+            'stream_html_form': measure(lambda: stream_body(loop, model, form), number),
+            'data_form': measure(model.data_form, number),
+            'validate_field': measure(lambda: model_class.validate_field(field, '5'), number),
+            'validate_form_per_second': validate_rate,
+            'html_form_peak_bytes': peak_memory(lambda: model.html_form(**flags)),
+            }
+    finally:
+        loop.close()
+
+
+def run(scenarios=SCENARIOS, number:int=10)->dict:
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'pydantic': pydantic.VERSION,
+            'machine': platform.machine(),
+            },
+        'results': {scenario.name: run_scenario(scenario, number) for scenario in scenarios},
+        }
+
+
+def higher_is_better(metric:str)->bool:
+    return metric.endswith('_per_second')
+
+
+def compare(results:dict, baseline:dict, threshold:float=1.5)->list:
+    """Returns the regressions of results against a baseline.
+
+    A metric regresses when it is more than threshold times worse than its
+    baseline value. Scenarios or metrics missing on either side are skipped.
+    """
+    regressions:list = []
+    for scenario, metrics in baseline.get('results', {}).items():
+        current:dict = results.get('results', {}).get(scenario, {})
+        for metric, expected in metrics.items():
+            value = current.get(metric)
+            if value is None or not expected:
+                continue
+            ratio = expected / value if higher_is_better(metric) else value / expected
+            if ratio > threshold:
+                regressions.append({'scenario': scenario, 'metric': metric, 'baseline': expected, 'value': value, 'ratio': round(ratio, 2)})
+    return regressions
+
+
+def main(argv:list=None)->int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', type=Path, help='write the results json to this file')
+    parser.add_argument('--baseline', type=Path, help='compare against this results json')
+    parser.add_argument('--threshold', type=float, default=1.5, help='allowed slowdown ratio against the baseline')
+    parser.add_argument('--number', type=int, default=10, help='calls per timing round')
+    parser.add_argument('--quick', action='store_true', help='only run the small scenarios')
+    args = parser.parse_args(argv)
+
+    results = run(QUICK_SCENARIOS if args.quick else SCENARIOS, number=args.number)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    else:
+        print(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), threshold=args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['scenario']} {regression['metric']}: {regression['baseline']} -> {regression['value']} (x{regression['ratio']})", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,5 @@
+import os
 from pathlib import Path
-from starlette.templating import Jinja2Templates
 
 ## This is the configuration file for the pyform project.
 ## It sets up the base path, static files path, and templates path.
@@ -12,11 +12,27 @@ TEMPLATES_PATH = BASE_PATH / "templates"
 NETWORK_CONFIG = {
     "host": "0.0.0.0",
     "port": 9093,
-    "debug": True,
+    "debug": os.environ.get("PYFORM_DEBUG", "1") == "1",
 }
 
+# Production server, python -m pyform serve
+WORKERS = os.cpu_count() or 1
+# precompiled render plans shared by the workers, None for a private directory made by each launch
+FORM_STORE_PATH = None
+
+# Rendered form cache configuration
+RESPONSE_CACHE_SIZE = 128
+
+# Render and validation timings, served at /metrics
+METRICS_ENABLED = True
+
 # Template configuration
 
-# Template settings
-TEMPLATES = Jinja2Templates(directory=TEMPLATES_PATH)
+# Template settings, TEMPLATES is built on first use so importing the config doesn't load Jinja
+def __getattr__(name:str):
+    if name == 'TEMPLATES':
+        from starlette.templating import Jinja2Templates
+        templates = globals()['TEMPLATES'] = Jinja2Templates(directory=TEMPLATES_PATH)
+        return templates
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
@@ -0,0 +1,198 @@
+import csv
+from asyncio import get_running_loop, to_thread
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from io import TextIOWrapper
+from json import dumps
+from tempfile import SpooledTemporaryFile
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional
+from pydantic import TypeAdapter, ValidationError
+from .form_spec import class_cache, form_layout
+
+## Batch validation of ModelForm shaped records.
+## Rows are dicts (nested like the model), or raw json lines which are
+## validated straight from json. Results are produced in input order, one
+## dict per row, and chunks of rows are validated at a time so memory stays
+## bounded however large the batch is.
+
+# Rows validated per chunk (and per process pool task)
+BATCH_CHUNK_SIZE:int = 256
+# Request bodies larger than this are spooled to disk
+SPOOL_SIZE:int = 1024 * 1024
+
+# The process pools of the batch requests by size, kept for the app's lifespan (see shutdown_pools)
+POOLS:Dict[int, ProcessPoolExecutor] = {}
+
+
+def process_pool(processes:int)->ProcessPoolExecutor:
+    """Returns the shared pool of processes workers, started by its first batch request"""
+    pool = POOLS.get(processes)
+    if pool is None:
+        pool = POOLS[processes] = ProcessPoolExecutor(max_workers=processes)
+    return pool
+
+
+def shutdown_pools():
+    """Shuts the process pools down, at the end of the app's lifespan"""
+    while POOLS:
+        _, pool = POOLS.popitem()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def type_adapter(model)->TypeAdapter:
+    """Returns the cached TypeAdapter of a model class"""
+    cache = class_cache(model)
+    adapter = cache.get('adapter')
+    if adapter is None:
+        adapter = cache['adapter'] = TypeAdapter(model)
+    return adapter
+
+
+def validate_row(model, index:int, row:Any)->dict:
+    """Validates a single row, returns its ok or field errors result"""
+    adapter:TypeAdapter = type_adapter(model)
+    try:
+        if isinstance(row, (str, bytes)):
+            value = adapter.validate_json(row)
+        else:
+            value = adapter.validate_python(row)
+    except ValidationError as e:
+        errors:dict = {}
+        for err in e.errors(include_url=False, include_context=False, include_input=False):
+            errors.setdefault('.'.join(str(loc) for loc in err['loc']), err['msg'])
+        return {'row': index, 'ok': False, 'errors': errors}
+    return {'row': index, 'ok': True, 'data': adapter.dump_python(value, mode='json')}
+
+
+def validate_chunk(model, start:int, rows:list)->list:
+    """Validates a chunk of rows, this is the unit of work of the process pool"""
+    return [validate_row(model, start + offset, row) for offset, row in enumerate(rows)]
+
+
+def iter_chunks(rows:Iterable, chunk_size:int=BATCH_CHUNK_SIZE)->Iterator[list]:
+    chunk:list = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_rows(model, rows:Iterable, processes:int=0, chunk_size:int=BATCH_CHUNK_SIZE)->Iterator[dict]:
+    """Validates an iterable of rows, yields one result per row in input order.
+
+    With processes, chunks of rows are validated in the shared process pool
+    of that size (see process_pool), with at most two chunks per process in flight.
+    """
+    if not processes:
+        for number, chunk in enumerate(iter_chunks(rows, chunk_size)):
+            yield from validate_chunk(model, number * chunk_size, chunk)
+        return
+    yield from _pooled(process_pool(processes), model, rows, processes * 2, chunk_size)
+
+
+def _pooled(pool:Executor, model, rows:Iterable, window:int, chunk_size:int)->Iterator[dict]:
+    pending:deque = deque()
+    try:
+        for number, chunk in enumerate(iter_chunks(rows, chunk_size)):
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+            pending.append(pool.submit(validate_chunk, model, number * chunk_size, chunk))
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # the pool is shared, only the unfinished chunks of an abandoned batch are dropped
+        for future in pending:
+            future.cancel()
+
+
+def csv_rows(model, lines:Iterable[str])->Iterator[dict]:
+    """Reads csv lines with flat form keys as headers into nested model input"""
+    layout = form_layout(model)
+    for record in csv.DictReader(lines):
+        yield layout.payload(record)
+
+
+def ndjson_lines(results:Iterable[dict])->Iterator[bytes]:
+    for result in results:
+        yield dumps(result, default=str).encode() + b'\n'
+
+
+async def spool_body(request)->SpooledTemporaryFile:
+    """Spools a request body, to disk past SPOOL_SIZE, so the response can be streamed after it"""
+    spool = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    async for data in request.stream():
+        spool.write(data)
+    spool.seek(0)
+    return spool
+
+
+async def request_rows(model, request)->Iterator:
+    """Returns the rows of a batch request.
+
+    The body is a csv upload (multipart), a csv body or NDJSON, one json
+    object per line. It is read through a spooled file, never held in memory.
+    """
+    content_type:str = request.headers.get('content-type', '')
+    if content_type.startswith('multipart/form-data'):
+        form = await request.form()
+        upload = next((value for value in form.values() if hasattr(value, 'file')), None)
+        if upload is None:
+            return iter(())
+        upload.file.seek(0)
+        return csv_rows(model, TextIOWrapper(upload.file, encoding='utf-8', newline=''))
+    spool = await spool_body(request)
+    if content_type.startswith('text/csv'):
+        return csv_rows(model, TextIOWrapper(spool, encoding='utf-8', newline=''))
+    return json_lines(spool)
+
+
+def json_lines(spool)->Iterator[bytes]:
+    # the generator keeps the spool referenced (and open) until it is exhausted
+    with spool:
+        for line in spool:
+            if line.strip():
+                yield line
+
+
+def _next_chunk(model, chunks:Iterator[list], start:int)->Optional[bytes]:
+    """Reads and validates the next chunk of rows as NDJSON, None once the rows are exhausted"""
+    chunk:Optional[list] = next(chunks, None)
+    if chunk is None:
+        return None
+    return b''.join(ndjson_lines(validate_chunk(model, start, chunk)))
+
+
+async def avalidate_rows(model, rows:Iterable, processes:int=0, chunk_size:int=BATCH_CHUNK_SIZE)->AsyncIterator[bytes]:
+    """Validates rows in a thread or in the shared process pool, yields NDJSON results chunk by chunk
+
+    The event loop never validates (nor reads) the rows itself, it keeps
+    serving the other requests while a large batch validates.
+    """
+    if not processes:
+        chunks:Iterator[list] = iter_chunks(rows, chunk_size)
+        number:int = 0
+        while (lines := await to_thread(_next_chunk, model, chunks, number * chunk_size)) is not None:
+            yield lines
+            number += 1
+        return
+    loop = get_running_loop()
+    pool:ProcessPoolExecutor = process_pool(processes)
+    chunks:Iterator[list] = iter_chunks(rows, chunk_size)
+    pending:deque = deque()
+    try:
+        number:int = 0
+        # the rows are read (and parsed) in a thread too
+        while (chunk := await to_thread(next, chunks, None)) is not None:
+            if len(pending) >= processes * 2:
+                yield b''.join(ndjson_lines(await pending.popleft()))
+            pending.append(loop.run_in_executor(pool, validate_chunk, model, number * chunk_size, chunk))
+            number += 1
+        while pending:
+            yield b''.join(ndjson_lines(await pending.popleft()))
+    finally:
+        # the pool outlives the request, only its unfinished chunks are dropped
+        for future in pending:
+            future.cancel()
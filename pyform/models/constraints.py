@@ -0,0 +1,133 @@
+import re
+from html import escape
+from typing import Any, Dict, Optional, Tuple
+
+## Client side validation. The json schema constraints of an input that the
+## browser can check are compiled into html validation attributes (required,
+## minlength, maxlength, min, max, step, pattern and the input type), so most
+## invalid submissions never reach validateForm. The constraints left to the
+## server are listed by field_validation.constraint_report.
+
+# Input types of the string formats the browser checks
+FORMAT_TYPES:Dict[str, str] = {'email': 'email', 'uri': 'url', 'date': 'date'}
+
+# Keywords of a property which are not about the value of its input
+ANNOTATIONS:frozenset = frozenset((
+    'title', 'description', 'default', 'examples', 'type', 'icon', 'options', 'search', 'range',
+    'min', 'max', 'step', 'file', 'accept', 'max_size', '$ref', 'deprecated', 'readOnly', 'writeOnly',
+    ))
+
+# Python regex syntax javascript does not understand
+PYTHON_ONLY_PATTERN = re.compile(r'\(\?P|\(\?[aiLmsux]+[):-]|\\[AZ]')
+
+
+def _nullable_schema(prop:dict)->Optional[dict]:
+    """The schema of the value of an Optional property, ``anyOf: [schema, {'type': 'null'}]``"""
+    choices:list = [choice for choice in prop.get('anyOf', ()) if choice.get('type') != 'null']
+    if len(choices) == 1 and len(choices) < len(prop['anyOf']):
+        return choices[0]
+    return None
+
+
+def _number(value:Any)->str:
+    return f"{int(value)}" if isinstance(value, float) and value.is_integer() else f"{value}"
+
+
+def _matches_empty(pattern:str)->bool:
+    try:
+        return re.search(pattern, '') is not None
+    except re.error:
+        # a pattern of pydantic's (rust) regex engine python cannot compile, left to the server
+        return True
+
+
+def _pattern(pattern:str)->Optional[str]:
+    """The html pattern matching like pydantic's, which searches the value, or None"""
+    if PYTHON_ONLY_PATTERN.search(pattern):
+        return None
+    # the browser matches the whole value
+    if pattern.startswith('^') and pattern.endswith('$') and not pattern.endswith('\\$'):
+        return pattern
+    return f".*(?:{pattern}).*"
+
+
+def compile_constraints(prop:dict, required:bool=False, optional:bool=False)->Tuple[Tuple[Tuple[str, Any], ...], Tuple[str, ...]]:
+    """Compiles the constraints of a json schema property into html validation attributes
+
+    Args:
+        optional (bool, optional): the input of an Optional sub model or a list item,
+            which is left empty when all its inputs are blank, so never required.
+
+    Returns:
+        tuple: the (name, value) attributes, value None for a boolean attribute,
+            and the keywords of the constraints the attributes cannot express.
+    """
+    nullable:Optional[dict] = _nullable_schema(prop)
+    schema:dict = {**prop, **nullable} if nullable is not None else prop
+    if nullable is not None:
+        del schema['anyOf']
+    kind:Optional[str] = schema.get('type')
+    format:Optional[str] = schema.get('format')
+    attributes:list = []
+    unexpressed:list = []
+    if format in FORMAT_TYPES and kind == 'string':
+        attributes.append(('type', FORMAT_TYPES[format]))
+    elif kind == 'integer':
+        attributes.append(('type', 'number'))
+    # an empty input is posted as '', which only a plain string accepts
+    empty_invalid:bool = nullable is None and (
+        kind in ('integer', 'number') or format in FORMAT_TYPES or schema.get('minLength', 0) > 0
+        or ('pattern' in schema and not _matches_empty(schema['pattern']))
+        or ('enum' in schema and '' not in schema['enum'])
+        )
+    if (required or empty_invalid) and not optional:
+        attributes.append(('required', None))
+    for keyword, value in schema.items():
+        if keyword in ANNOTATIONS:
+            continue
+        if keyword == 'minLength':
+            attributes.append(('minlength', value))
+        elif keyword == 'maxLength':
+            attributes.append(('maxlength', value))
+        elif keyword == 'minimum':
+            attributes.append(('min', _number(value)))
+        elif keyword == 'maximum':
+            attributes.append(('max', _number(value)))
+        elif keyword in ('exclusiveMinimum', 'exclusiveMaximum') and kind in ('integer', 'number'):
+            bound:str = 'min' if keyword == 'exclusiveMinimum' else 'max'
+            if kind == 'integer' and float(value).is_integer():
+                # the closest integer inside the bound
+                attributes.append((bound, _number(value + 1 if bound == 'min' else value - 1)))
+            else:
+                # the browser accepts the bound itself
+                attributes.append((bound, _number(value)))
+                unexpressed.append(keyword)
+        elif keyword == 'multipleOf':
+            continue
+        elif keyword == 'pattern' and _pattern(value) is not None:
+            attributes.append(('pattern', _pattern(value)))
+        elif keyword == 'format' and (format == 'binary' or (format in FORMAT_TYPES and kind == 'string')):
+            # the input type, binary for a file input
+            continue
+        else:
+            unexpressed.append(keyword)
+    step = schema.get('multipleOf')
+    if step is not None:
+        # the browser counts the steps from min
+        start:float = float(dict(attributes).get('min', 0)) / step
+        if abs(start - round(start)) < 1e-9:
+            attributes.append(('step', _number(step)))
+        else:
+            unexpressed.append('multipleOf')
+    elif kind == 'integer':
+        attributes.append(('step', 1))
+    return tuple(attributes), tuple(unexpressed)
+
+
+def constraint_attributes(constraints:Tuple[Tuple[str, Any], ...], skip:tuple=('type',))->str:
+    """The markup of html validation attributes, the type is usually rendered by the input itself"""
+    return ''.join(
+        f' {name}' if value is None else f' {name}="{escape(f"{value}")}"'
+        for name, value in constraints if name not in skip
+        )
+
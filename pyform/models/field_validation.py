@@ -0,0 +1,117 @@
+from functools import partial
+from typing import Annotated, Any, Callable, Dict, Optional, Tuple, get_args
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from .form_spec import class_cache, form_layout, form_spec
+from .options import OPTION_ERROR, is_option, option_indexes
+
+## Validation of a single form field, for inline (on change) validation.
+## Each input gets a validator built once per class from the field of the
+## model that owns it: a TypeAdapter of the field's annotation and
+## constraints, or, when the owner declares field validators for it (which
+## may read the other fields through info.data), validate_assignment on a
+## fresh model_construct() instance per call. No state is shared between calls.
+
+
+def owner_model(model, path:tuple):
+    """The model class owning the field at path, or None"""
+    for segment in path[:-1]:
+        if isinstance(segment, int):
+            continue
+        field = getattr(model, 'model_fields', {}).get(segment)
+        if field is None:
+            return None
+        model = _model_type(field.annotation)
+    return model if isinstance(model, type) and issubclass(model, BaseModel) else None
+
+
+def _model_type(annotation)->Any:
+    """The model class in an annotation such as ``Contact``, ``Optional[Contact]`` or ``List[Contact]``"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        found = _model_type(arg)
+        if found is not None:
+            return found
+    return None
+
+
+def _has_field_validators(owner, name:str)->bool:
+    return any(
+        name in decorator.info.fields or '*' in decorator.info.fields
+        for decorator in owner.__pydantic_decorators__.field_validators.values()
+        )
+
+
+def _assign(owner, name:str, value:Any)->Any:
+    # a new instance per call, the values of one request never reach the next one's info.data
+    return owner.__pydantic_validator__.validate_assignment(owner.model_construct(), name, value)
+
+
+def field_validators(model)->Dict[str, Callable[[Any], Any]]:
+    """Returns the validators of the inputs of a model form by dotted key, built once per class
+
+    A validator checks a value against the field's own annotation and
+    constraints, no other field is validated.
+    """
+    cache = class_cache(model)
+    validators = cache.get('field_validators')
+    if validators is None:
+        validators = {}
+        for key, path in form_layout(model).paths.items():
+            owner = owner_model(model, path)
+            if owner is None:
+                continue
+            name:str = path[-1]
+            if _has_field_validators(owner, name):
+                validators[key] = partial(_assign, owner, name)
+            else:
+                field = owner.model_fields[name]
+                validators[key] = TypeAdapter(Annotated[field.annotation, field], config=owner.model_config).validate_python
+        cache['field_validators'] = validators
+    return validators
+
+
+def validate_field(model, key:str, value:Any)->Optional[str]:
+    """Validates the value of the input named key, returns its first error message or None
+
+    Raises:
+        KeyError: when the model form has no such input.
+    """
+    validator = field_validators(model)[key]
+    try:
+        validator(value)
+    except ValidationError as e:
+        return e.errors(include_url=False, include_context=False, include_input=False)[0]['msg']
+    index = option_indexes(model).get(key)
+    if index is not None and not is_option(index, value):
+        return OPTION_ERROR.format(title=index.title)
+    return None
+
+
+def constraint_report(model)->Dict[str, Tuple[str, ...]]:
+    """Returns the constraints of the inputs of a model form left to the server by dotted key, built once per class
+
+    Those are the json schema keywords without an html validation attribute
+    (see constraints), the field validators (``validator <name>``) and the
+    option membership of the searchable selects (``options``). Inputs the
+    browser checks fully are left out.
+    """
+    cache = class_cache(model)
+    report = cache.get('constraints')
+    if report is None:
+        report = {}
+        for field in form_spec(model).leaves:
+            constraints:list = list(field.unexpressed)
+            if field.kind == 'search':
+                constraints.append('options')
+            owner = owner_model(model, field.path)
+            if owner is not None:
+                constraints.extend(
+                    f"validator {decorator.cls_var_name}"
+                    for decorator in owner.__pydantic_decorators__.field_validators.values()
+                    if field.path[-1] in decorator.info.fields or '*' in decorator.info.fields
+                    )
+            if constraints:
+                report[field.key] = tuple(constraints)
+        cache['constraints'] = report
+    return report
@@ -1,73 +1,181 @@
 
-from typing import TypeVar
-from secrets import token_urlsafe
-from pydantic import BaseModel, Field, ConfigDict, ValidationError 
-from typing import Generic, TypeVar, Optional, Dict, Any
-from starlette.responses import StreamingResponse,  HTMLResponse, JSONResponse
+from asyncio import gather
+from copy import deepcopy
+from time import perf_counter
+from pydantic import BaseModel, ConfigDict, ValidationError, model_validator
+from pydantic_core import PydanticCustomError
+from typing import Optional, Dict, Any, Iterable, Iterator, AsyncIterator, Awaitable, Callable, ClassVar, Tuple
+from .batch import BATCH_CHUNK_SIZE, avalidate_rows, csv_rows, request_rows, validate_rows
+from .constraints import constraint_attributes
+from .field_validation import constraint_report, field_validators, validate_field
+from .form_state import FieldState, FormState, form_state
+from .form_spec import FieldSpec, FormLayout, FormSpec, GroupSpec, class_cache, form_layout, form_spec, lookup_path
+from .metrics import METRICS, RENDER_SECONDS, RENDERS_TOTAL, VALIDATE_SECONDS, VALIDATIONS_TOTAL
+from .options import OPTION_ERROR, OPTIONS_MAX_PAGE_SIZE, OPTIONS_PAGE_SIZE, OptionIndex, is_option, option_indexes
+from .registry import register
+from .render_plan import CHUNK_SIZE, CSRF, FORM, ID_PREFIX, INVALID, INVALID_FIELD, NAME_PREFIX, RenderPlan, Slot, compile_render_plan, fill_slot, fragment, render_plan, splice
+from .uploads import UPLOAD_MAX_TOTAL_SIZE, UploadTooLarge, close_uploads, read_form, upload_limits
 
-T = TypeVar('T', bound=BaseModel)
+# starlette is imported by the methods building responses, validation alone never loads it
 
 
-class FormField(BaseModel):
-    """A class to represent a form field"""
-    name: str = None
-    error: str = None
-    value: Optional[Any] | None = None
-    
-    class Config:
-        frozen = True
+class ModelForm(BaseModel):     
+    model_config = ConfigDict(json_schema_extra={'icon': 'location-arrow'}) 
+    # field name -> async callable (model, request) returning {'value': ..., 'options': [...]}
+    # for fields whose value or select options come from an async source
+    form_sources: ClassVar[Dict[str, Callable[..., Awaitable[dict]]]] = {}
+    # url of the inline validation route (see field_response), None renders no inline validation
+    field_check: ClassVar[Optional[str]] = None
+    # url of the options route of the searchable selects (see options_response), None renders them as selects
+    options_url: ClassVar[Optional[str]] = None
+    # size limit in bytes of a posted upload form, its files each have their own (see uploads)
+    max_upload_size: ClassVar[int] = UPLOAD_MAX_TOTAL_SIZE
 
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        # pydantic's variant of __init_subclass__, called once the class is fully built
+        super().__pydantic_init_subclass__(**kwargs)
+        register(cls)
 
-class Form(BaseModel, Generic[T]):
-    """A class to represent a form"""
-    csrf: str = token_urlsafe(16)
-    fields: Dict[str, FormField]= Field(default_factory=dict)
-    model: Optional[T] = None
-    
 
-class ModelForm(BaseModel):     
-    model_config = ConfigDict(json_schema_extra={'icon': 'location-arrow'}) 
+    @model_validator(mode='wrap')
+    @classmethod
+    def check_options(cls, data:Any, handler):
+        """Checks the values of the searchable selects against their option index, next to the other field errors"""
+        indexes:Dict[str, OptionIndex] = option_indexes(cls)
+        if not indexes or not isinstance(data, dict):
+            return handler(data)
+        paths:dict = cls.form_layout().paths
+        missing:list = []
+        for key, index in indexes.items():
+            value = lookup_path(data, paths[key])
+            if not is_option(index, value):
+                error = PydanticCustomError('option', OPTION_ERROR, {'title': index.title})
+                missing.append({'type': error, 'loc': paths[key], 'input': value})
+        try:
+            result = handler(data)
+        except ValidationError as e:
+            if not missing:
+                raise
+            raise ValidationError.from_exception_data(cls.__name__, e.errors() + missing)
+        if missing:
+            raise ValidationError.from_exception_data(cls.__name__, missing)
+        return result
     
-    def form_template(self,  post:str=None, target:str=None, insert:bool=False, form:Form=None, values:bool=False, errors:bool=False):
+    def form_template(self,  post:str=None, target:str=None, insert:bool=False, form:FormState=None, values:bool=False, errors:bool=False):
         """Returns a Jinja templated html form of the model 
 
         Args:
             insert (bool, optional): to insert css and icons resources or use local resources.
         """
-        form_html:str =""
-        for i in  self.generate_html_form(post=post, target=target, insert=insert, form=form, values=values, errors=errors):
-            form_html = form_html + i
-        return  form_html
+        return  self.render_form(post=post, target=target, insert=insert, form=form, values=values, errors=errors).decode()
     
 
-    def html_form(self,  post:str=None, target:str=None, insert:bool=False, form:Form=None, values:bool=False, errors:bool=False):
+    def html_form(self,  post:str=None, target:str=None, insert:bool=False, form:FormState=None, values:bool=False, errors:bool=False):
         """Returns a html form of the model 
 
         Args:
             insert (bool, optional): to insert css and icons resources or use local resources.
         """
-        form_html:str =""
-        for i in  self.generate_html_form(post=post, target=target, insert=insert, form=form, values=values, errors=errors):
-            form_html = form_html + i
-        return  HTMLResponse(form_html)
+        from starlette.responses import HTMLResponse
+        return  HTMLResponse(self.render_form(post=post, target=target, insert=insert, form=form, values=values, errors=errors))
+
+
+    def render_form(self, post:str=None, target:str=None, insert:bool=False, form:FormState=None, values:bool=False, errors:bool=False)->bytes:
+        """Renders the html form of the model by filling its precompiled RenderPlan"""
+        started:float = perf_counter() if METRICS.enabled else 0.0
+        plan:RenderPlan = self.render_plan(post=post, target=target, insert=insert, values=values, errors=errors)
+        if started:
+            METRICS.phase(RENDER_SECONDS, self.__class__, 'schema', started)
+        if form:
+            pass
+        else:
+            form = self.data_form()
+        mark:float = perf_counter() if started else 0.0
+        page:bytes = plan.render(form)
+        if started:
+            METRICS.phase(RENDER_SECONDS, self.__class__, 'generate', mark)
+            METRICS.phase(RENDER_SECONDS, self.__class__, 'total', started)
+            METRICS.increment(RENDERS_TOTAL, (('model', self.__class__.__name__),))
+        return page
+
+
+    @classmethod
+    def render_plan(cls, post:str=None, target:str=None, insert:bool=False, values:bool=False, errors:bool=False)->RenderPlan:
+        """Returns the RenderPlan of the model for the given flags, compiled once per class"""
+        return render_plan(cls, post=post, target=target, insert=insert, values=values, errors=errors)
 
     
-    def stream_html_form(self, post:str=None, target:str=None, insert:bool=False, form:Form=None, values:bool=False, errors:bool=False):
-        """Streams the Generated html form for the model
+    def stream_html_form(self, post:str=None, target:str=None, insert:bool=False, form:FormState=None, values:bool=False, errors:bool=False, request=None, chunk_size:int=CHUNK_SIZE):
+        """Streams the Generated html form for the model from the event loop, no threadpool involved
         Args:
-            request (Request): The request object
+            request (Request, optional): The request object, passed on to the form_sources.
+            chunk_size (int, optional): the fragments are merged into body chunks of about this many bytes.
         Returns:
-            HTMLResponse: The HTML response with the form
+            StreamingResponse: The streaming response with the form
         """
-        return StreamingResponse( self.generate_html_form( post=post, target=target, insert=insert, form=form, values=values, errors=errors), media_type="text/html")
+        from starlette.responses import StreamingResponse
+        return StreamingResponse( self.agenerate_html_form( post=post, target=target, insert=insert, form=form, values=values, errors=errors, request=request, chunk_size=chunk_size), media_type="text/html")
 
 
-    def generate_html_form(self, post:str=None, target:str=None, insert:bool=False, form:Form=None, values:bool=False, errors:bool=False):
-            """Generates a Html form of the instantiated model"""  
-            if form:
-                pass
-            else:
-                form = self.data_form()          
+    async def agenerate_html_form(self, post:str=None, target:str=None, insert:bool=False, form:FormState=None, values:bool=False, errors:bool=False, request=None, chunk_size:int=CHUNK_SIZE)->AsyncIterator[bytes]:
+        """Generates the Html form of the model as byte chunks on the event loop.
+
+        The form_sources of the model are awaited first, their values are
+        rendered when values is set and their options replace the static ones.
+        """
+        started:float = perf_counter() if METRICS.enabled else 0.0
+        plan:RenderPlan = self.render_plan(post=post, target=target, insert=insert, values=values, errors=errors)
+        if started:
+            METRICS.phase(RENDER_SECONDS, self.__class__, 'schema', started)
+        if form:
+            pass
+        else:
+            form = self.data_form(request=request)
+        if self.form_sources:
+            form = await self.aresolve_sources(form, request=request)
+        first:bool = True
+        for chunk in plan.chunks(form, chunk_size=chunk_size):
+            if first and started:
+                METRICS.phase(RENDER_SECONDS, self.__class__, 'first_byte', started)
+            first = False
+            yield chunk
+        if started:
+            METRICS.phase(RENDER_SECONDS, self.__class__, 'total', started)
+            METRICS.increment(RENDERS_TOTAL, (('model', self.__class__.__name__),))
+
+
+    async def aresolve_sources(self, form:FormState, request=None)->FormState:
+        """Awaits the form_sources of the model concurrently, returns a copy of form with their results"""
+        form = form_state(form)
+        names:list = list(self.form_sources)
+        results = await gather(*(self.form_sources[name](self, request) for name in names))
+        fields:dict = dict(form.fields)
+        options:dict = dict(form.options or {})
+        for name, result in zip(names, results):
+            if 'value' in result:
+                field:FieldState = fields.get(name)
+                fields[name] = FieldState(name, field.error if field is not None else None, result['value'])
+            if 'options' in result:
+                options[name] = result['options']
+        return form.replace(fields=fields, options=options)
+
+
+    def generate_html_form(self, post:str=None, target:str=None, insert:bool=False, form:FormState=None, values:bool=False, errors:bool=False):
+        """Generates a Html form of the instantiated model from its cached RenderPlan"""  
+        plan:RenderPlan = self.render_plan(post=post, target=target, insert=insert, values=values, errors=errors)
+        if form:
+            pass
+        else:
+            form = self.data_form()
+        form = form_state(form)
+        for segment in plan.segments:
+            yield fill_slot(segment, form) if segment.__class__ is Slot else segment.decode()
+
+
+    @classmethod
+    def form_segments(cls, post:str=None, target:str=None, insert:bool=False, values:bool=False, errors:bool=False):
+            """Yields the markup of the model form, with a Slot wherever form data goes"""
             if not insert:
                 yield """<!DOCTYPE html><html lang="en">
                 <head>
@@ -82,133 +190,32 @@ class ModelForm(BaseModel):
                      
                 </head>
                 <body> <p class="text-xs"><i class="fa fa-asterisk"></i>ModelForm with Header</p>"""
+            spec:FormSpec = cls.form_spec()
+            # the files of the upload fields are only posted by multipart forms, htmx follows the enctype
+            enctype:str = ' enctype="multipart/form-data"' if cls.upload_limits() else ''
             if post and target:
-                yield f"""<div style="margin:50px;"><form method="POST" hx-post="{post}" hx-target="#{target}">"""
+                yield f"""<div style="margin:50px;"><form method="POST"{enctype} hx-post="{post}" hx-target="#{target}">"""
             else:
-                yield """<div style="margin:50px;"><form method="POST">"""
-            yield f"""          
-                <input type="hidden" name="csrf" value="{form.get('csrf')}" />"""
-            yield f""" <h3 class="title is-4">{ self.model_json_schema().get('title')}</h3> """
+                yield f"""<div style="margin:50px;"><form method="POST"{enctype}>"""
+            yield """          
+                <input type="hidden" name="csrf" value=\""""
+            yield CSRF
+            yield '" />'
+            # the keys rendered with an error, kept up to date by the out of band swaps
+            # of render_error_fragments, so it is there (empty) from the first page on
+            if errors:
+                yield f"""<input type="hidden" name="{INVALID_FIELD}" id="{INVALID_FIELD}" value=\""""
+                yield INVALID
+                yield '" />'
+            else:
+                yield f"""<input type="hidden" name="{INVALID_FIELD}" id="{INVALID_FIELD}" value="" />"""
+            yield f""" <h3 class="title is-4">{ spec.title}</h3> """
             
-            for key, value in self.model_json_schema().get('properties').items():                
-                if value.get('$ref'):
-                    pass
-                else:
-                    yield f""" <fieldset class="fieldset">                    
-                    <label class="label" for="{key}">{value.get('title')}<span class="fa fa-{value.get('icon')}"></span>"""
-                    # Numerical Input Fields...
-                    if value.get('type') == 'number':                        
-                        if values:
-                            yield f""" <input class="input is_primary" type="number" step="0.001" name="{key}" id="{key}" placeholder="{value.get('title')}" value="{form.get('fields', {}).get(key, {}).get('value')}" />"""
-                        else:
-                            yield f""" <input class="input is_primary" type="number" step="0.001" name="{key}" id="{key}" placeholder="{value.get('title')}"  />"""
-                       
-                        if errors and form.get('fields', {}).get(key, {}).get('error'):
-                            yield f"""</label> <div class="text-xs text-red-500 font-semibold">{form.get('fields', {}).get(key, {}).get('error')}</div></fieldset>"""
-                        else:
-                            yield """</label></fieldset>"""
-                        # Checkbox Fields...
-                    elif value.get('type') == 'boolean':
-                        
-                        if value.get('default') == False:
-                            yield f"""<input type="checkbox" name="{key}" id="{key}"  class="checkbox checkbox-primary checkbox-sm" />"""
-                        else:
-                            yield f"""<input type="checkbox" name="{key}" id="{key}"  checked="checked" class="checkbox checkbox-primary checkbox-sm" />"""
-                        yield f""" {key}
-                            </label>
-                        </fieldset>"""
-                        # do further checks for file upload field, radio buttons, fields etc...
-                        # Select Fields...
-                    elif value.get('options'):
-                        yield f""" <select name="{key}" id="{key}" class="select">
-                                <option disabled selected>Pick a {value.get('title')}</option>"""
-                        for option in value.get('options'):
-                            yield f"""<option>{option}</option>"""                               
-                        yield f""" </select>                           
-                            </fieldset>"""
-                    # Range Fields...
-                    elif value.get('range'):
-                        yield f"""<output class="range-output" for="{key}"></output>
-                        <input type="range" min="{value.get('min')}" max="{value.get('max')}" step="{value.get('step')}" name="{key}" id="{key}" value="{value.get('default')}"  />
-                        </label></fieldset>
-                        <script type="module">
-                            const range = document.querySelector("#{key}");
-                            const output = document.querySelector(".range-output");
-
-                            output.textContent = range.value;"""
-
-                        yield """ range.addEventListener("input", () => {output.textContent = range.value; });
-                        </script>
-                        """
-
-                    else:
-                        # Text, Email, Password  Input Fields...
-                        if values:
-                            yield f""" <input class="input is_primary" type="{value.get('type')}" name="{key}" id="{key}" placeholder="{value.get('title')}" value="{form.get('fields', {}).get(key, {}).get('value')}" />"""
-                        else:
-                            yield f""" <input class="input is_primary" type="{value.get('type')}" name="{key}" id="{key}" placeholder="{value.get('title')}"  />"""
-                                         
-                        if errors and form.get('fields', {}).get(key, {}).get('error'):
-                            yield f"""</label> <div class="text-xs text-red-500 font-semibold">{form.get('fields', {}).get(key, {}).get('error')}</div></fieldset>"""
-                        else:
-                            yield """</label></fieldset>"""
+            for value in spec.fields:
+                if value.kind not in ('model', 'list'):
+                    yield from cls.field_segments(value, value.name, value.name, values=values, errors=errors)
             # process the nested fields
-            if self.model_json_schema().get('$defs'):
-                yield f"""<div class="join join-vertical bg-base-100">"""
-               
-                for key2, value2 in self.model_json_schema().get('$defs').items():
-                    yield f"""<div class="collapse collapse-arrow join-item border-base-300 border">
-                        <input type="radio" name="my-accordion-0"/>                    
-                        <div class="collapse-title font-semibold"> <div class="badge badge-outline badge-primary ">{key2}</div></div>
-                        <div class="collapse-content text-sm">""" 
-                                       
-                    for key3, value3 in value2.get('properties').items():
-                        yield f"""<fieldset class="fieldset">        
-                            <label class="label" for="{key3}">{value3.get('title')}<span class="fa fa-{value3.get('icon')}"></span>"""
-                        if value3.get('type') == 'number':
-                            if values:
-                                yield f"""
-                                    <input  class="input is_primary" type="{value3.get('type')}" step="0.001" name="{key3}" id="{key3}" placeholder="{value3.get('title')}" value="{form.get('fields', {}).get(key3, {}).get('value')}" />"""
-                            else:
-                                yield f"""<input  class="input is_primary" type="number" step="0.001" name="{key3}" id="{key3}" placeholder="{value3.get('title')}" />"""
-                                                
-                            if errors and form.get('fields', {}).get(key3, {}).get('error'):
-                                yield f"""</label> <div class="text-xs text-red-500 font-semibold">{form.get('fields', {}).get(key3, {}).get('error')}</div></fieldset>"""
-                            else:
-                                yield """</label></fieldset>"""
-                        
-                        elif value3.get('type') == 'boolean':
-                        
-                            if value3.get('default') == False:
-                                yield f"""<input type="checkbox" name="{key3}" id="{key3}"  class="checkbox checkbox-primary checkbox-sm" />"""
-                            else:
-                                yield f"""<input type="checkbox" name="{key3}" id="{key3}"  checked="checked" class="checkbox checkbox-primary checkbox-sm" />"""
-                            yield f""" {key3}
-                                </label>
-                            </fieldset>"""
-                        elif value3.get('options'):
-                            yield f""" <select name="{key3}" id="{key3}" class="select">
-                                    <option disabled selected>Pick a {value3.get('title')}</option>"""
-                            for option in value3.get('options'):
-                                yield f"""<option>{option}</option>"""                               
-                            yield f""" </select>
-                             
-                                </fieldset>"""
-
-                        # do further checks for file upload field, radio buttons,select fields etc...
-                        else:  
-                                                      
-                            if values:
-                                yield f""" <input  class="input is_primary" type="{value3.get('type')}" name="{key3}" id="{key3}" placeholder="{value3.get('title')}" value="{form.get('fields', {}).get(key3, {}).get('value')}"/>"""
-                            else:
-                                yield f""" <input  class="input is_primary" type="{value3.get('type')}" name="{key3}" id="{key3}" placeholder="{value3.get('title')}" />"""
-                                                                             
-                            if errors and form.get('fields', {}).get(key3, {}).get('error'):
-                                yield f"""</label><div class="text-xs text-red-500 font-semibold">{form.get('fields', {}).get(key3, {}).get('error')}</div></fieldset>"""
-                            else:
-                                yield """</label></fieldset>"""
-                    yield """</div>"""
-                yield """</div>"""                 
+            yield from cls.nested_segments(spec.fields, values=values, errors=errors)
                     
             yield f"""<div class="field flex flex-row is-grouped mt-5">
                         <div class="control">
@@ -220,11 +227,219 @@ class ModelForm(BaseModel):
                     </div>
                     </form>
                     </div>
-                    <p class="text-xs text-blue-500 font-fine"><strong>Form Data</strong> {form}</p>"""
-            if not insert: 
+                    <p class="text-xs text-blue-500 font-fine"><strong>Form Data</strong> """
+            yield FORM
+            yield '</p>'
+            if not insert:
                 yield """</body></html>"""
 
+
+    @classmethod
+    def render_settings(cls)->tuple:
+        """The class settings the markup depends on, part of the keys of the cached plans and fragments"""
+        return (cls.field_check, cls.options_url)
+
+
+    @classmethod
+    def field_segments(cls, value:FieldSpec, key:str, id:str, values:bool=False, errors:bool=False, oob:bool=False):
+        """Yields the markup of a single input field named key, with Slots for its value, error and options
+
+        Args:
+            oob (bool, optional): mark the fieldset as an htmx out of band swap.
+        """
+        swap:str = ' hx-swap-oob="true"' if oob else ''
+        # inline validation of text and number inputs on change, see field_response
+        check:str = f' hx-post="{cls.field_check}" hx-trigger="change" hx-params="csrf,{key}" hx-target="#{id}-error" hx-swap="outerHTML"' if cls.field_check else ''
+        # the constraints the browser checks itself, see constraints
+        attributes:str = constraint_attributes(value.constraints)
+        required:str = ' required' if ('required', None) in value.constraints else ''
+        yield f""" <fieldset class="fieldset" id="{id}-fieldset"{swap}>
+                    <label class="label" for="{id}">{value.title}<span class="fa fa-{value.icon}"></span>"""
+        # Numerical Input Fields...
+        if value.kind == 'number':
+            step = dict(value.constraints).get('step', '0.001')
+            attributes = constraint_attributes(value.constraints, skip=('type', 'step'))
+            if values:
+                yield f""" <input class="input is_primary" type="number" step="{step}" name="{key}" id="{id}" placeholder="{value.title}"{attributes}{check} value=\""""
+                yield Slot('value', key)
+                yield '" />'
+            else:
+                yield f""" <input class="input is_primary" type="number" step="{step}" name="{key}" id="{id}" placeholder="{value.title}"{attributes}{check}  />"""
+
+            yield from cls.error_segments(key, id, errors=errors)
+            # Checkbox Fields...
+        elif value.kind == 'boolean':
+
+            if value.default == False:
+                yield f"""<input type="checkbox" name="{key}" id="{id}"  class="checkbox checkbox-primary checkbox-sm" />"""
+            else:
+                yield f"""<input type="checkbox" name="{key}" id="{id}"  checked="checked" class="checkbox checkbox-primary checkbox-sm" />"""
+            yield f""" {value.name}
+                            </label>
+                        </fieldset>"""
+            # do further checks for radio buttons, fields etc...
+            # File Upload Fields, never prefilled...
+        elif value.kind == 'file':
+            accept:str = f' accept="{value.accept}"' if value.accept else ''
+            yield f""" <input class="file-input file-input-sm" type="file" name="{key}" id="{id}"{accept}{required} />"""
+            yield from cls.error_segments(key, id, errors=errors)
+            # Select Fields...
+        elif value.kind == 'search' and cls.options_url:
+            # a typeahead input, the options starting with the typed text are fetched into its datalist
+            if values:
+                yield f""" <input class="input is_primary" type="search" name="{key}" id="{id}" list="{id}-options" placeholder="Pick a {value.title}"{attributes} autocomplete="off" hx-get="{cls.options_url}?field={key}" hx-trigger="input changed delay:200ms" hx-target="#{id}-options" hx-params="{key}" value=\""""
+                yield Slot('value', key)
+                yield '" />'
+            else:
+                yield f""" <input class="input is_primary" type="search" name="{key}" id="{id}" list="{id}-options" placeholder="Pick a {value.title}"{attributes} autocomplete="off" hx-get="{cls.options_url}?field={key}" hx-trigger="input changed delay:200ms" hx-target="#{id}-options" hx-params="{key}" />"""
+            yield f"""<datalist id="{id}-options"></datalist>"""
+            yield from cls.error_segments(key, id, errors=errors)
+        elif value.kind in ('select', 'search'):
+            yield f""" <select name="{key}" id="{id}" class="select"{required}>
+                                <option value="" disabled selected>Pick a {value.title}</option>"""
+            options:str = ''.join(f"""<option>{option}</option>""" for option in value.options)
+            if key in cls.form_sources:
+                # the static options, unless the form data brings its own
+                yield Slot('options', key, absent=options)
+            else:
+                yield options
+            yield f""" </select>
+                            </fieldset>"""
+        # Range Fields...
+        elif value.kind == 'range':
+            yield f"""<output class="range-output" for="{id}"></output>
+                        <input type="range" min="{value.bounds[0]}" max="{value.bounds[1]}" step="{value.bounds[2]}" name="{key}" id="{id}" value="{value.default}"  />
+                        </label></fieldset>
+                        <script type="module">
+                            const range = document.querySelector("#{id}");
+                            const output = document.querySelector(".range-output");
+
+                            output.textContent = range.value;"""
+
+            yield """ range.addEventListener("input", () => {output.textContent = range.value; });
+                        </script>
+                        """
+
+        else:
+            # Text, Email, Password  Input Fields...
+            input_type:str = dict(value.constraints).get('type', value.type)
+            if values:
+                yield f""" <input class="input is_primary" type="{input_type}" name="{key}" id="{id}" placeholder="{value.title}"{attributes}{check} value=\""""
+                yield Slot('value', key)
+                yield '" />'
+            else:
+                yield f""" <input class="input is_primary" type="{input_type}" name="{key}" id="{id}" placeholder="{value.title}"{attributes}{check}  />"""
+
+            yield from cls.error_segments(key, id, errors=errors)
+
+
+    @classmethod
+    def error_segments(cls, key:str, id:str, errors:bool=False):
+        """Yields the end of the fieldset of an input, with a Slot for its error"""
+        if cls.field_check:
+            # an always present error container, the target of the inline validation
+            before:str = f"""</label> <div class="text-xs text-red-500 font-semibold" id="{id}-error">"""
+            absent:str = f"""</label><div id="{id}-error"></div></fieldset>"""
+        else:
+            before = """</label> <div class="text-xs text-red-500 font-semibold">"""
+            absent = """</label></fieldset>"""
+        if errors:
+            yield Slot('error', key, before=before, after="""</div></fieldset>""", absent=absent)
+        else:
+            yield absent
+
+
+    @classmethod
+    def nested_segments(cls, fields:Iterable[FieldSpec], key:str='', id:str='', values:bool=False, errors:bool=False, stack:tuple=(), optional:bool=False):
+        """Yields the accordion of the nested model and list of models fields among fields.
+
+        Inputs are named by their dotted path below key (e.g. ``address.street``,
+        ``contacts.0.tel``) and their ids joined with ``-``. The inputs below an
+        Optional or list parent, optional, are never required.
+        """
+        spec:FormSpec = cls.form_spec()
+        nested:list = [value for value in fields if value.kind in ('model', 'list') and value.ref in spec.defs and value.ref not in stack]
+        if not nested:
+            return
+        yield f"""<div class="join join-vertical bg-base-100">"""
+        for value in nested:
+            group:GroupSpec = spec.defs[value.ref]
+            if value.kind == 'model':
+                items:list = [(f"{key}{value.name}.", f"{id}{value.name}-", group.name)]
+            else:
+                items = [(f"{key}{value.name}.{index}.", f"{id}{value.name}-{index}-", f"{group.name} {index + 1}") for index in range(value.items)]
+            for prefix, id_prefix, badge in items:
+                yield f"""<div class="collapse collapse-arrow join-item border-base-300 border">
+                        <input type="radio" name="my-accordion-{id}0"/>
+                        <div class="collapse-title font-semibold"> <div class="badge badge-outline badge-primary ">{badge}</div></div>
+                        <div class="collapse-content text-sm">"""
+                below:bool = optional or value.nullable or value.kind == 'list'
+                yield from splice(cls.sub_form_segments(group, values=values, errors=errors, stack=stack, optional=below), prefix, id_prefix)
+                yield """</div>"""
+        yield """</div>"""
+
+
+    @classmethod
+    def sub_form_segments(cls, group:GroupSpec, values:bool=False, errors:bool=False, stack:tuple=(), optional:bool=False)->tuple:
+        """Returns the fragment of a nested model, rendered once and shared by every form embedding it.
+
+        The fragment is keyed by the content digest of the model, its names and
+        ids are placeholders filled in by splice.
+        """
+        stack = stack + (group.name,)
+        # only the recursive references cut below this model change its markup
+        cut:tuple = tuple(ref for ref in stack if ref in group.refs)
+        key:tuple = (cls.field_segments.__func__, cls.nested_segments.__func__, group.digest, values, errors, optional, cut) + cls.render_settings()
+        fields:tuple = group.optional_fields if optional else group.fields
+
+        def segments():
+            for value in fields:
+                if value.kind not in ('model', 'list'):
+                    yield from cls.field_segments(value, NAME_PREFIX + value.name, ID_PREFIX + value.name, values=values, errors=errors)
+            yield from cls.nested_segments(fields, NAME_PREFIX, ID_PREFIX, values=values, errors=errors, stack=stack, optional=optional)
+
+        return fragment(key, segments)
+
     
+    @classmethod
+    def fieldset_plans(cls)->Dict[str, RenderPlan]:
+        """Returns the out of band RenderPlans of the fieldsets that show errors, by dotted key, compiled once per class"""
+        cache:dict = class_cache(cls)
+        plans = cache.get(('fieldsets',) + cls.render_settings())
+        if plans is None:
+            plans = {}
+            for value in cls.form_spec().leaves:
+                plan = compile_render_plan(cls.field_segments(value, value.key, value.id, values=True, errors=True, oob=True))
+                if any(segment.kind == 'error' for segment in plan.segments if isinstance(segment, Slot)):
+                    plans[value.key] = plan
+            cache[('fieldsets',) + cls.render_settings()] = plans
+        return plans
+
+
+    @classmethod
+    def render_error_fragments(cls, form:FormState, invalid:Iterable[str]=())->Optional[bytes]:
+        """Renders the fieldsets whose error state changed as htmx out of band swaps.
+
+        invalid holds the keys rendered with an error by the previous response.
+        Returns None when the submitted fields are not the ones the form renders,
+        the page then needs a full re-render.
+        """
+        plans:Dict[str, RenderPlan] = cls.fieldset_plans()
+        paths:dict = cls.form_layout().paths
+        form = form_state(form)
+        fields:dict = form.fields
+        # checkboxes and unpicked selects are not submitted, text inputs always are
+        if not fields.keys() <= paths.keys() or not plans.keys() <= fields.keys():
+            return None
+        invalid = set(invalid)
+        parts:list = [
+            plan.render(form) for key, plan in plans.items()
+            if key in invalid or fields[key].error
+            ]
+        parts.append(f"""<input type="hidden" name="{INVALID_FIELD}" id="{INVALID_FIELD}" value="{fill_slot(INVALID, form)}" hx-swap-oob="true" />""".encode())
+        return b''.join(parts)
+
+
     @property        
     def model_data(self)->set:        
         return dict(self.model_dump())
@@ -232,41 +447,77 @@ class ModelForm(BaseModel):
     @property        
     def model_nested_fields(self)->list:        
         # checking for nested fields
-        def_props:list = []
-        if '$defs' in self.json_schema.keys():
-            defs:dict = self.json_schema.get('$defs')
-            def_keys:list = defs.keys()
-            for m_field in def_keys:
-                def_props.append(defs.get(m_field).get('properties'))
-        return def_props 
+        defs:dict = self.form_spec().schema.get('$defs', {})
+        return [defs.get(group.name).get('properties') for group in self.form_spec().groups]
         
     
     @property        
     def formfields(self)->set:  
-        fields:set = set() 
-        # checking for nested fields
-        def_props:list = []
-        if '$defs' in self.json_schema.keys():
-            defs:dict = self.json_schema.get('$defs')
-            def_keys:list = defs.keys()
-            for m_field in def_keys:
-                def_props.append(defs.get(m_field).get('properties').keys())
-            nested_form_fields = set([item for row in def_props for item in row])
-            return self.model_fields_set.union(nested_form_fields)
-        else:
-            return self.model_fields_set
+        return self.model_fields_set.union(self.form_spec().nested_names)
         
     
     @property
-    def json_schema(self):
-        return self.model_json_schema()
+    def json_schema(self)->dict:
+        """The json schema of the model, a copy of the one built once per class"""
+        return deepcopy(self.form_spec().schema)
+
+
+    @classmethod
+    def form_spec(cls)->FormSpec:
+        """Returns the compiled field descriptors of the model, built once per class"""
+        return form_spec(cls)
+
+
+    @classmethod
+    def form_layout(cls)->FormLayout:
+        """Returns the map of dotted form keys to model paths, built once per class"""
+        return form_layout(cls)
+
+
+    @classmethod
+    def validate_batch(cls, rows:Iterable, processes:int=0, chunk_size:int=BATCH_CHUNK_SIZE)->Iterator[dict]:
+        """Validates a batch of records through the cached TypeAdapter of the model
+
+        Args:
+            rows (Iterable): dicts shaped like the model, or json encoded lines.
+            processes (int, optional): validate chunks of rows in a pool of this many processes.
+        Returns:
+            Iterator[dict]: {'row', 'ok', 'data'} or {'row', 'ok', 'errors'} per record, in input order.
+        """
+        return validate_rows(cls, rows, processes=processes, chunk_size=chunk_size)
+
+
+    @classmethod
+    def validate_csv(cls, lines:Iterable[str], processes:int=0, chunk_size:int=BATCH_CHUNK_SIZE)->Iterator[dict]:
+        """Validates csv records whose headers are the flat form keys of the model"""
+        return validate_rows(cls, csv_rows(cls, lines), processes=processes, chunk_size=chunk_size)
+
+
+    @classmethod
+    async def batch_response(cls, request=None, processes:int=0, chunk_size:int=BATCH_CHUNK_SIZE):
+        """Validates the NDJSON, csv or csv upload body of a request, streams the results as NDJSON"""
+        from starlette.responses import StreamingResponse
+        rows = await request_rows(cls, request)
+        return StreamingResponse(avalidate_rows(cls, rows, processes=processes, chunk_size=chunk_size), media_type="application/x-ndjson")
     
     
-    def data_form(self, request=None)->dict:
-        pd_form:Form = Form(model=self)
-        for field in self.formfields:
-            pd_form.fields[field] = FormField(name=field, value=pd_form.model.model_dump().get(field))
-        return pd_form.model_dump()
+    def data_form(self, request=None, csrf:str=None)->FormState:
+        """Returns the state of the form of the model, its values from a single model_dump
+
+        Args:
+            csrf (str, optional): the csrf token of the form, a fresh one by default.
+        """
+        started:float = perf_counter() if METRICS.enabled else 0.0
+        paths:dict = self.form_layout().paths
+        data:dict = self.model_dump()
+        fields:dict = {
+            field: FieldState(field, None, lookup_path(data, paths.get(field, (field,))))
+            for field in self.formfields
+            }
+        form:FormState = FormState(csrf=csrf, fields=fields, model=data)
+        if started:
+            METRICS.phase(RENDER_SECONDS, self.__class__, 'data_form', started)
+        return form
     
     
     def validateRequestData(self, data:dict=None):
@@ -286,54 +537,163 @@ class ModelForm(BaseModel):
             return {'ERROR': e.json()}  
                  
    
-    async def validateForm(self, request=None, schema:BaseModel=None, json_data:bool=False): 
-        from json import loads
+    @classmethod
+    def validate_field(cls, key:str, value:Any)->Optional[str]:
+        """Validates a single input of the form by its dotted key, returns its error message or None
+
+        Only the field's own constraints and field validators run, through a
+        validator built once per field and class.
+        """
+        return validate_field(cls, key, value)
+
+
+    @classmethod
+    def field_validators(cls)->Dict[str, Callable[[Any], Any]]:
+        """Returns the single field validators of the form by dotted key, built once per class"""
+        return field_validators(cls)
+
+
+    @classmethod
+    def constraint_report(cls)->Dict[str, Tuple[str, ...]]:
+        """Returns the constraints of each input the browser cannot check by dotted key, left to validateForm"""
+        return constraint_report(cls)
+
+
+    @classmethod
+    def option_indexes(cls)->Dict[str, OptionIndex]:
+        """Returns the option index of each searchable select by dotted key, built once per class"""
+        return option_indexes(cls)
+
+
+    @classmethod
+    def upload_limits(cls)->Dict[str, int]:
+        """Returns the size limit of each file field by dotted key, built once per class"""
+        return upload_limits(cls)
+
+
+    @classmethod
+    async def options_response(cls, request=None):
+        """Returns a page of the options of a searchable select starting with the typed text, as datalist options
+
+        The query holds the dotted key of the field, the typed text (under the
+        field's own name, as htmx sends it, or q) and optionally page and size.
+        """
+        from starlette.responses import HTMLResponse, PlainTextResponse
+        params = request.query_params
+        key:str = params.get('field')
+        index:OptionIndex = cls.option_indexes().get(key)
+        if index is None:
+            # the key comes from the client, never sent back as html
+            return PlainTextResponse(f"Unknown field {key}", status_code=400)
+        try:
+            page:int = max(0, int(params.get('page', 0)))
+            size:int = min(max(1, int(params.get('size', OPTIONS_PAGE_SIZE))), OPTIONS_MAX_PAGE_SIZE)
+        except ValueError:
+            return PlainTextResponse("page and size must be integers", status_code=400)
+        matches:list = index.search(params.get(key, params.get('q', '')), start=page * size, count=size)
+        return HTMLResponse(''.join(f"""<option>{option}</option>""" for option in matches))
+
+
+    @classmethod
+    def field_error(cls, key:str, error:Optional[str]=None)->str:
+        """Returns the error container of an input, as swapped in by the inline validation"""
+        id:str = key.replace('.', '-')
+        if error:
+            return f"""<div class="text-xs text-red-500 font-semibold" id="{id}-error">{error}</div>"""
+        return f"""<div id="{id}-error"></div>"""
+
+
+    @classmethod
+    async def field_response(cls, request=None):
+        """Validates the one input posted by an inline validation request, returns its error fragment"""
+        from starlette.responses import HTMLResponse, PlainTextResponse
         data = await request.form()
-        modeled_data = schema().model_data 
-        for key, value in modeled_data.items():
-            if type(value) == dict:
-                for key2 in value.keys():
-                    if key2 in data:
-                        value[key2] = data.get(key2)
-                    else:
-                        pass
-            else:
-                modeled_data[key] = data.get(key)        
-        result = self.validateRequestData(data=modeled_data)
-        if 'ERROR' in result: #.get('ERROR'):
-            errors = loads(result.get('ERROR'))
-            pd_form:Form = Form()
-            data = dict(data)
-            for key, value in data.items():
-                if key == 'csrf':
-                    pass
-                else:
-                    for err in errors:
-                        if key in err.get('loc'):
-                            pd_form.fields[key] = FormField(name=key, error=err.get('msg') ,value=value)
-                        else:
-                            pd_form.fields[key] = FormField(name=key, value=value)
-            pd_form.csrf = data.get('csrf')
-            pd_form.model = schema
-            form = schema()            
-            form_html = form.html_form(post='/form', target="form", insert=True, form=pd_form.model_dump(), values=True, errors=True)
-            return form_html
-            #return pd_form #pd_form #dict(data)
+        key = next((key for key in data if key != 'csrf'), None)
+        try:
+            error = cls.validate_field(key, data[key])
+        except KeyError:
+            # the key comes from the client, never sent back as html
+            return PlainTextResponse(f"Unknown field {key}", status_code=400)
+        return HTMLResponse(cls.field_error(key, error))
+
+
+    async def validateForm(self, request=None, schema:BaseModel=None, json_data:bool=False, fragments:bool=False):
+        """Validates a submitted form, re-renders it with the field errors on failure
+
+        The fields of an upload form are validated with the handles of their
+        spooled files, closed once the response is built. An upload over its
+        size limit is answered with a 413.
+
+        Args:
+            fragments (bool, optional): on failure send only the fieldsets whose error
+                state changed, as htmx out of band swaps, when the form layout allows.
+        """
+        from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse
+        schema = schema or self.__class__
+        started:float = perf_counter() if METRICS.enabled else 0.0
+        layout:FormLayout = schema.form_layout()
+        limits:Dict[str, int] = schema.upload_limits()
+        try:
+            # the files of an upload form are streamed to spooled temporary files
+            data = await read_form(request, limits, schema.max_upload_size)
+        except UploadTooLarge as e:
+            # the message names the part the client sent, never sent back as html
+            return PlainTextResponse(f"{e}", status_code=413)
+        try:
+            mark:float = METRICS.phase(VALIDATE_SECONDS, schema, 'parse', started) if started else 0.0
+            payload:dict = layout.payload(data)
+            try:
+                result = schema.model_validate(payload)
+            except ValidationError as e:
+                if started:
+                    mark = METRICS.phase(VALIDATE_SECONDS, schema, 'validate', mark)
+                    METRICS.increment(VALIDATIONS_TOTAL, (('model', schema.__name__), ('result', 'error')))
+                # index the errors by location, the first error of a field wins
+                errors:dict = {}
+                for err in e.errors(include_url=False, include_context=False, include_input=False):
+                    errors.setdefault(err['loc'], err['msg'])
+                fields:dict = {}
+                for key, value in data.items():
+                    if key == 'csrf' or key == INVALID_FIELD:
+                        continue
+                    fields[key] = FieldState(key, errors.get(layout.paths.get(key, (key,))), value)
+                form:FormState = FormState(csrf=data.get('csrf'), fields=fields, model=payload)
+                if fragments:
+                    page = schema.render_error_fragments(form, invalid=filter(None, data.get(INVALID_FIELD, '').split(',')))
+                    if page is not None:
+                        if started:
+                            METRICS.phase(VALIDATE_SECONDS, schema, 'rerender', mark)
+                            METRICS.phase(VALIDATE_SECONDS, schema, 'total', started)
+                        # the swaps are all out of band, the form itself stays as it is
+                        return HTMLResponse(page, headers={'HX-Reswap': 'none'})
+                plan:RenderPlan = schema.render_plan(post='/form', target="form", insert=True, values=True, errors=True)
+                page:bytes = plan.render(form)
+                if started:
+                    METRICS.phase(VALIDATE_SECONDS, schema, 'rerender', mark)
+                    METRICS.phase(VALIDATE_SECONDS, schema, 'total', started)
+                return HTMLResponse(page)
+            if started:
+                METRICS.phase(VALIDATE_SECONDS, schema, 'validate', mark)
+                METRICS.phase(VALIDATE_SECONDS, schema, 'total', started)
+                METRICS.increment(VALIDATIONS_TOTAL, (('model', schema.__name__), ('result', 'ok')))
         
-        if json_data:
-            return JSONResponse(dict(result.model_dump()))
-        else:
-            return HTMLResponse(f"""<div class="card w-96 bg-base-100 card-xs shadow-sm">
-                                    <div class="card-body">
-                                        <h2 class="card-title">Data Exchange</h2>
-                                        <p>{result}</p>
-                                        <p class="text-xs text-blue-500">{data}</p>
+            if json_data:
+                return JSONResponse(dict(result.model_dump()))
+            else:
+                return HTMLResponse(f"""<div class="card w-96 bg-base-100 card-xs shadow-sm">
+                                        <div class="card-body">
+                                            <h2 class="card-title">Data Exchange</h2>
+                                            <p>{result}</p>
+                                            <p class="text-xs text-blue-500">{data}</p>
                                         
-                                        <div class="justify-end card-actions">
-                                        <button class="btn btn-success btn-sm">Success</button>
+                                            <div class="justify-end card-actions">
+                                            <button class="btn btn-success btn-sm">Success</button>
+                                            </div>
                                         </div>
-                                    </div>
-                                </div>""")
+                                    </div>""")
+        finally:
+            if limits:
+                await close_uploads(data)
 
 
 if __name__ == '__main__':
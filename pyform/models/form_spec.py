@@ -0,0 +1,362 @@
+from hashlib import blake2b
+from json import dumps
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Tuple, Union
+from weakref import WeakKeyDictionary
+from .constraints import compile_constraints
+
+# A model path, list items are addressed by their int index
+Path = Tuple[Union[str, int], ...]
+
+
+class FieldSpec(NamedTuple):
+    """A compiled, immutable description of a single form field.
+
+    kind is ``model`` for a nested model and ``list`` for a list of nested
+    models, ref names their $defs entry. A select with ``search`` set in its
+    json_schema_extra is of kind ``search``, one with ``file`` set is a file
+    upload, accept and max_size restrict its files (see uploads). nullable
+    is set for an Optional field.
+    """
+    name: str
+    title: Optional[str] = None
+    icon: Optional[str] = None
+    type: Optional[str] = None
+    kind: str = 'input'
+    options: Optional[Tuple[Any, ...]] = None
+    bounds: Optional[Tuple[Any, Any, Any]] = None
+    default: Any = None
+    path: Path = ()
+    ref: Optional[str] = None
+    accept: Optional[str] = None
+    max_size: Optional[int] = None
+    nullable: bool = False
+    # html validation attributes, (name, value) pairs, and the schema keywords they miss (see constraints)
+    constraints: Tuple[Tuple[str, Any], ...] = ()
+    unexpressed: Tuple[str, ...] = ()
+
+    @property
+    def key(self)->str:
+        """The dotted name of the field's html input, e.g. ``address.street``"""
+        return dotted(self.path)
+
+    @property
+    def id(self)->str:
+        """The id of the field's html input, e.g. ``address-street``"""
+        return '-'.join(f"{segment}" for segment in self.path)
+
+    @property
+    def items(self)->int:
+        """The number of sub forms rendered for a list field"""
+        return max(1, len(self.default)) if isinstance(self.default, list) else 1
+
+
+class GroupSpec(NamedTuple):
+    """A compiled nested model ($defs entry) and its fields.
+
+    The paths of the fields are relative to the model. digest identifies the
+    definition and the definitions it references, refs, so equal sub models
+    of different forms share a digest. optional_fields are the fields as the
+    inputs of an Optional or list parent, never required.
+    """
+    name: str
+    title: Optional[str] = None
+    fields: Tuple[FieldSpec, ...] = ()
+    digest: str = ''
+    refs: frozenset = frozenset()
+    optional_fields: Tuple[FieldSpec, ...] = ()
+
+
+class FormSpec(NamedTuple):
+    """The compiled field descriptors of a ModelForm class"""
+    title: Optional[str]
+    fields: Tuple[FieldSpec, ...]
+    defs: Dict[str, GroupSpec]
+    schema: dict
+    # the inputs of the form, nested models resolved, with their full paths
+    leaves: Tuple[FieldSpec, ...] = ()
+
+    @property
+    def groups(self)->Tuple[GroupSpec, ...]:
+        return tuple(self.defs.values())
+
+    @property
+    def nested_names(self)->frozenset:
+        return frozenset(field.key for field in self.leaves if len(field.path) > 1)
+
+
+class FormLayout(NamedTuple):
+    """Maps the dotted keys of a submitted html form onto a model's nested layout"""
+    # model_dump of a default instance
+    defaults: dict
+    # dotted form key -> model path
+    paths: Dict[str, Path]
+    # the Optional sub models and the list items with the keys of their inputs, in the order payload empties them
+    optionals: Tuple[Tuple[Path, Tuple[str, ...]], ...] = ()
+
+    def payload(self, data)->dict:
+        """Builds the nested model input from flat form data.
+
+        Top level fields missing from data are None, nested ones keep their default.
+        An Optional sub model whose submitted inputs are all empty is None and
+        such a trailing list item is left out, the browser posts '' for every
+        blank text input.
+        """
+        payload:dict = copy_containers(self.defaults)
+        for key, path in self.paths.items():
+            if len(path) == 1:
+                payload[key] = data.get(key)
+            elif key in data:
+                assign_path(payload, path, data[key])
+        for path, keys in self.optionals:
+            submitted:list = [data[key] for key in keys if key in data]
+            if not submitted or any(value != '' for value in submitted):
+                continue
+            parent = lookup_path(payload, path[:-1])
+            if isinstance(parent, dict):
+                parent[path[-1]] = None
+            elif isinstance(parent, list) and path[-1] == len(parent) - 1:
+                # only the last item, the errors of the others keep their index
+                parent.pop()
+        return payload
+
+
+def dotted(path:Path)->str:
+    return '.'.join(f"{segment}" for segment in path)
+
+
+def copy_containers(value:Any)->Any:
+    """Copies the dicts and lists of a nested structure, the leaves are shared"""
+    if isinstance(value, dict):
+        return {key: copy_containers(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_containers(item) for item in value]
+    return value
+
+
+def lookup_path(node:Any, path:Path)->Any:
+    """The value at path in a nested structure, or None"""
+    for segment in path:
+        if isinstance(node, dict):
+            node = node.get(segment)
+        elif isinstance(node, list) and isinstance(segment, int) and segment < len(node):
+            node = node[segment]
+        else:
+            return None
+    return node
+
+
+def assign_path(node:Any, path:Path, value:Any):
+    """Sets the value at path in a nested structure, creating missing dicts and list items"""
+    for segment, child_segment in zip(path, path[1:]):
+        child = lookup_path(node, (segment,))
+        if not isinstance(child, (dict, list)):
+            child = [] if isinstance(child_segment, int) else {}
+            _store(node, segment, child)
+        node = child
+    _store(node, path[-1], value)
+
+
+def _store(node:Any, segment:Union[str, int], value:Any):
+    if isinstance(node, list):
+        while len(node) <= segment:
+            node.append({})
+    node[segment] = value
+
+
+# class -> (validator the entry was built against, cache dict)
+_CLASS_CACHE: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def class_cache(cls)->dict:
+    """Returns the per class cache dict of a model.
+
+    The dict is dropped and replaced whenever pydantic rebuilds the class
+    (e.g. through ``model_rebuild``), which swaps its ``__pydantic_validator__``.
+    """
+    validator = getattr(cls, '__pydantic_validator__', None)
+    entry = _CLASS_CACHE.get(cls)
+    if entry is None or entry[0] is not validator:
+        entry = (validator, {})
+        _CLASS_CACHE[cls] = entry
+    return entry[1]
+
+
+def _ref_name(prop:dict)->Optional[str]:
+    """The $defs name a property references, directly or through an Optional"""
+    ref = prop.get('$ref')
+    if not ref:
+        ref = next((option['$ref'] for option in prop.get('anyOf', ()) if '$ref' in option), None)
+    if ref:
+        return ref.rsplit('/', 1)[-1]
+    return None
+
+
+def _items_ref_name(prop:dict)->Optional[str]:
+    """The $defs name of the items of a list property"""
+    if prop.get('type') == 'array':
+        return _ref_name(prop.get('items', {}))
+    for option in prop.get('anyOf', ()):
+        if option.get('type') == 'array':
+            return _ref_name(option.get('items', {}))
+    return None
+
+
+def _field_kind(prop:dict)->str:
+    if _ref_name(prop):
+        return 'model'
+    if _items_ref_name(prop):
+        return 'list'
+    if prop.get('type') == 'number':
+        return 'number'
+    if prop.get('type') == 'boolean':
+        return 'boolean'
+    if prop.get('file'):
+        return 'file'
+    if prop.get('options') is not None:
+        return 'search' if prop.get('search') else 'select'
+    if prop.get('range'):
+        return 'range'
+    return 'input'
+
+
+def compile_field(name:str, prop:dict, path:Path, required:bool=False, optional:bool=False)->FieldSpec:
+    """Compiles a json schema property into a FieldSpec
+
+    Args:
+        required (bool, optional): the property is in the required list of its model.
+        optional (bool, optional): the property is below an Optional or list parent.
+    """
+    options = prop.get('options')
+    constraints, unexpressed = compile_constraints(prop, required=required, optional=optional)
+    return FieldSpec(
+        name=name,
+        title=prop.get('title'),
+        icon=prop.get('icon'),
+        type=prop.get('type'),
+        kind=_field_kind(prop),
+        options=tuple(options) if options is not None else None,
+        bounds=(prop.get('min'), prop.get('max'), prop.get('step')) if prop.get('range') else None,
+        default=prop.get('default'),
+        path=path,
+        ref=_ref_name(prop) or _items_ref_name(prop),
+        accept=prop.get('accept'),
+        max_size=prop.get('max_size'),
+        nullable=any(choice.get('type') == 'null' for choice in prop.get('anyOf', ())),
+        constraints=constraints,
+        unexpressed=unexpressed,
+        )
+
+
+def _def_refs(name:str, definitions:dict)->frozenset:
+    """The names of the definitions a definition references, transitively"""
+    refs:set = set()
+    pending:list = [name]
+    while pending:
+        for prop in definitions[pending.pop()].get('properties', {}).values():
+            ref = _ref_name(prop) or _items_ref_name(prop)
+            if ref in definitions and ref not in refs:
+                refs.add(ref)
+                pending.append(ref)
+    return frozenset(refs)
+
+
+def compile_group(name:str, definitions:dict)->GroupSpec:
+    """Compiles a $defs entry into a GroupSpec"""
+    definition:dict = definitions[name]
+    refs:frozenset = _def_refs(name, definitions)
+    closure:dict = {ref: definitions[ref] for ref in sorted(refs | {name})}
+
+    def fields(optional:bool)->Tuple[FieldSpec, ...]:
+        return tuple(
+            compile_field(key, prop, (key,), required=key in definition.get('required', ()), optional=optional)
+            for key, prop in definition.get('properties', {}).items()
+            )
+
+    return GroupSpec(
+        name=name,
+        title=definition.get('title'),
+        fields=fields(False),
+        digest=blake2b(dumps(closure, sort_keys=True, default=str).encode(), digest_size=16).hexdigest(),
+        refs=refs,
+        optional_fields=fields(True),
+        )
+
+
+def iter_leaves(fields:Tuple[FieldSpec, ...], defs:Dict[str, GroupSpec], path:Path=(), stack:tuple=(), optional:bool=False)->Iterator[FieldSpec]:
+    """Yields the input fields under fields with their full paths.
+
+    Nested models are resolved to any depth, a list of models yields the
+    fields of each rendered item, recursive references are cut. Below an
+    Optional or list parent, optional, the fields are its optional_fields.
+    """
+    for field in fields:
+        field_path:Path = path + (field.name,)
+        if field.kind not in ('model', 'list'):
+            yield field._replace(path=field_path)
+        elif field.ref in defs and field.ref not in stack:
+            group:GroupSpec = defs[field.ref]
+            below:bool = optional or field.nullable or field.kind == 'list'
+            group_fields:tuple = group.optional_fields if below else group.fields
+            if field.kind == 'model':
+                yield from iter_leaves(group_fields, defs, field_path, stack + (field.ref,), below)
+            else:
+                for index in range(field.items):
+                    yield from iter_leaves(group_fields, defs, field_path + (index,), stack + (field.ref,), below)
+
+
+def iter_optionals(fields:Tuple[FieldSpec, ...], defs:Dict[str, GroupSpec], path:Path=(), stack:tuple=())->Iterator[Tuple[Path, Tuple[str, ...]]]:
+    """Yields the Optional sub models and the list items under fields with the keys of their inputs.
+
+    The nested ones come before the model holding them and the items of a
+    list from the last to the first.
+    """
+    for field in fields:
+        if field.kind not in ('model', 'list') or field.ref not in defs or field.ref in stack:
+            continue
+        group:GroupSpec = defs[field.ref]
+        field_path:Path = path + (field.name,)
+        nodes:list = [field_path] if field.kind == 'model' else [field_path + (index,) for index in reversed(range(field.items))]
+        for node in nodes:
+            yield from iter_optionals(group.fields, defs, node, stack + (field.ref,))
+            if field.kind == 'list' or field.nullable:
+                yield node, tuple(leaf.key for leaf in iter_leaves(group.fields, defs, node, stack + (field.ref,)))
+
+
+def compile_form_spec(model)->FormSpec:
+    """Builds the FormSpec of a pydantic model class from its json schema"""
+    schema:dict = model.model_json_schema()
+    fields = tuple(
+        compile_field(key, prop, (key,), required=key in schema.get('required', ()))
+        for key, prop in schema.get('properties', {}).items()
+        )
+    definitions:dict = schema.get('$defs', {})
+    defs:dict = {name: compile_group(name, definitions) for name in definitions}
+    return FormSpec(title=schema.get('title'), fields=fields, defs=defs, schema=schema, leaves=tuple(iter_leaves(fields, defs)))
+
+
+def form_spec(model)->FormSpec:
+    """Returns the cached FormSpec of a pydantic model class"""
+    cache = class_cache(model)
+    spec = cache.get('spec')
+    if spec is None:
+        spec = cache['spec'] = compile_form_spec(model)
+    return spec
+
+
+def compile_form_layout(model)->FormLayout:
+    """Builds the FormLayout of a pydantic model class from its spec and default values"""
+    spec:FormSpec = form_spec(model)
+    return FormLayout(
+        defaults=model.model_construct().model_dump(),
+        paths={field.key: field.path for field in spec.leaves},
+        optionals=tuple(iter_optionals(spec.fields, spec.defs)),
+        )
+
+
+def form_layout(model)->FormLayout:
+    """Returns the cached FormLayout of a pydantic model class"""
+    cache = class_cache(model)
+    layout = cache.get('layout')
+    if layout is None:
+        layout = cache['layout'] = compile_form_layout(model)
+    return layout
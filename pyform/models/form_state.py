@@ -0,0 +1,68 @@
+from secrets import token_urlsafe
+from typing import Any, Dict, Optional
+
+## The per request state of a rendered form: its csrf token, the value and
+## error of each input, by dotted key, and the options of the selects fed by
+## form_sources. Plain __slots__ objects, the render plans read their
+## attributes directly.
+
+
+class FieldState:
+    """The name, error and submitted or current value of an input"""
+    __slots__ = ('name', 'error', 'value')
+
+    def __init__(self, name:str, error:Optional[str]=None, value:Any=None):
+        self.name = name
+        self.error = error
+        self.value = value
+
+    def as_dict(self)->dict:
+        return {'name': self.name, 'error': self.error, 'value': self.value}
+
+    def __repr__(self)->str:
+        return repr(self.as_dict())
+
+
+class FormState:
+    """The state of a form for one request
+
+    model holds the values of the form as a dict shaped like the model: the
+    model_dump of the instance (data_form) or the submitted values which
+    failed validation (validateForm).
+    """
+    __slots__ = ('csrf', 'fields', 'model', 'options')
+
+    def __init__(self, csrf:Optional[str]=None, fields:Optional[Dict[str, FieldState]]=None, model:Optional[dict]=None, options:Optional[dict]=None):
+        # a fresh token for every form, unless one is given
+        self.csrf = token_urlsafe(16) if csrf is None else csrf
+        self.fields = {} if fields is None else fields
+        self.model = model
+        self.options = options
+
+    def replace(self, **changes)->'FormState':
+        """Returns a copy of the state with some attributes replaced"""
+        state = FormState.__new__(FormState)
+        for name in FormState.__slots__:
+            setattr(state, name, changes[name] if name in changes else getattr(self, name))
+        return state
+
+    def as_dict(self)->dict:
+        fields:dict = {key: {'name': field.name, 'error': field.error, 'value': field.value} for key, field in self.fields.items()}
+        form:dict = {'csrf': self.csrf, 'fields': fields, 'model': self.model}
+        if self.options is not None:
+            form['options'] = self.options
+        return form
+
+    def __repr__(self)->str:
+        return repr(self.as_dict())
+
+
+def form_state(form)->FormState:
+    """Returns form as a FormState, converting the dict layout of FormState.as_dict"""
+    if form.__class__ is FormState:
+        return form
+    fields:dict = {
+        key: FieldState(field.get('name', key), field.get('error'), field.get('value'))
+        for key, field in (form.get('fields') or {}).items()
+        }
+    return FormState(csrf=form.get('csrf'), fields=fields, model=form.get('model'), options=form.get('options'))
@@ -0,0 +1,135 @@
+import os
+import pickle
+from hashlib import blake2b
+from json import dumps
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from struct import Struct
+from tempfile import mkstemp
+from typing import Dict, Iterable, Optional
+from .form_spec import class_cache
+from .registry import FORMS, registered_forms
+from .render_plan import RenderPlan, Slot
+
+## A file of precompiled render plans, written once by the launcher process
+## and memory-mapped read-only by every server worker.
+## Static segments are stored once, however many plans and forms share them,
+## and workers render from memoryview slices of the mapping: the pages are
+## shared between the processes instead of copied into each of them.
+##
+##     [static segments][pickled index][index offset]
+
+# Environment variable the launcher passes the store path to its workers in
+STORE_ENV:str = 'PYFORM_FORM_STORE'
+TRAILER = Struct('<Q')
+
+
+def schema_digest(cls)->str:
+    """Identifies the json schema a form's plans were compiled from"""
+    return blake2b(dumps(cls.form_spec().schema, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+def cached_plans(cls)->dict:
+    """The compiled RenderPlans in the cache of a form class, by cache key"""
+    return {
+        key: value for key, value in class_cache(cls).items()
+        if isinstance(value, RenderPlan) or (isinstance(key, tuple) and key[0] == 'fieldsets')
+        }
+
+
+def write_store(path:Path, forms:Optional[Iterable[type]]=None)->int:
+    """Writes the cached plans of forms (by default every registered form) to path
+
+    The forms are expected to be warmed up, see registry.warm_up.
+    Returns:
+        int: the size of the static segments in bytes.
+    """
+    blob = bytearray()
+    offsets:Dict[bytes, int] = {}
+
+    def pack(plan:RenderPlan)->tuple:
+        packed:list = []
+        for segment in plan.segments:
+            if segment.__class__ is Slot:
+                packed.append(segment)
+                continue
+            offset = offsets.get(segment)
+            if offset is None:
+                offset = offsets[segment] = len(blob)
+                blob.extend(segment)
+            packed.append((offset, len(segment)))
+        return tuple(packed)
+
+    index:dict = {}
+    for cls in registered_forms() if forms is None else forms:
+        plans:dict = {}
+        for key, value in cached_plans(cls).items():
+            if isinstance(value, RenderPlan):
+                plans[key] = pack(value)
+            else:
+                plans[key] = {name: pack(plan) for name, plan in value.items()}
+        index[f"{cls.__module__}.{cls.__qualname__}"] = (schema_digest(cls), plans)
+    path = Path(path)
+    # a new file, never one (or a link) already there, renamed over the store once complete
+    descriptor, partial = mkstemp(dir=path.parent, prefix=path.name, suffix='.partial')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(blob)
+            file.write(pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+            file.write(TRAILER.pack(len(blob)))
+        os.replace(partial, path)
+    except BaseException:
+        os.unlink(partial)
+        raise
+    return len(blob)
+
+
+class FormStore:
+    """A read-only mapping of a plan store file"""
+
+    def __init__(self, path:Path):
+        with open(path, 'rb') as file:
+            self.map = mmap(file.fileno(), 0, access=ACCESS_READ)
+        self.view = memoryview(self.map)
+        end:int = len(self.map) - TRAILER.size
+        (start,) = TRAILER.unpack_from(self.map, end)
+        self.index:dict = pickle.loads(self.view[start:end])
+
+    def plan(self, packed:tuple)->RenderPlan:
+        """A RenderPlan whose static segments are zero-copy slices of the mapping"""
+        view = self.view
+        return RenderPlan(tuple(
+            segment if segment.__class__ is Slot else view[segment[0]:segment[0] + segment[1]]
+            for segment in packed
+            ))
+
+    def install(self)->list:
+        """Puts the stored plans of the registered forms into their class caches
+
+        Forms whose schema changed since the store was written are skipped.
+        Returns:
+            list: the form classes the plans were installed for.
+        """
+        installed:list = []
+        for name, cls in list(FORMS.items()):
+            entry = self.index.get(name)
+            if entry is None or entry[0] != schema_digest(cls):
+                continue
+            cache:dict = class_cache(cls)
+            for key, packed in entry[1].items():
+                if isinstance(packed, dict):
+                    cache[key] = {field: self.plan(segments) for field, segments in packed.items()}
+                else:
+                    cache[key] = self.plan(packed)
+            installed.append(cls)
+        return installed
+
+
+def load_store(path:Optional[Path]=None)->Optional[FormStore]:
+    """Maps the store at path, or at the path the launcher passed in the environment, and installs it"""
+    path = path or os.environ.get(STORE_ENV)
+    if not path or not Path(path).exists():
+        return None
+    store = FormStore(path)
+    store.install()
+    return store
@@ -0,0 +1,176 @@
+import os
+from math import inf
+from time import perf_counter
+from typing import Dict, Tuple
+
+## Optional timing hooks of the render and validation hot paths.
+## Call sites check METRICS.enabled before reading the clock, so disabled
+## hooks cost one attribute lookup:
+##
+##     started = perf_counter() if METRICS.enabled else 0.0
+##     ...
+##     if started:
+##         METRICS.phase(RENDER_SECONDS, model, 'total', started)
+##
+## The series are kept per process. Under python -m pyform serve each worker
+## has its own and /metrics renders those of the worker serving the scrape,
+## labelled with its pid (see worker_labels); sum them by the other labels.
+
+RENDER_SECONDS:str = 'pyform_render_phase_seconds'
+VALIDATE_SECONDS:str = 'pyform_validate_phase_seconds'
+REQUEST_SECONDS:str = 'pyform_request_seconds'
+RENDERS_TOTAL:str = 'pyform_renders_total'
+VALIDATIONS_TOTAL:str = 'pyform_validations_total'
+
+# Number of server worker processes, set by the launcher
+WORKERS_ENV:str = 'PYFORM_WORKERS'
+
+# Histogram bucket upper bounds in seconds
+BUCKETS:Tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, inf)
+
+HELP:Dict[str, str] = {
+    RENDER_SECONDS: 'Time spent in each phase of rendering a form',
+    VALIDATE_SECONDS: 'Time spent in each phase of validating a submitted form',
+    REQUEST_SECONDS: 'Latency of requests to the form routes',
+    RENDERS_TOTAL: 'Forms rendered',
+    VALIDATIONS_TOTAL: 'Submitted forms validated, by result',
+}
+
+
+class Histogram:
+    """Counts of observations per bucket, with their sum"""
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts:list = [0] * len(BUCKETS)
+        self.sum:float = 0.0
+        self.count:int = 0
+
+    def observe(self, value:float):
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Histograms and counters keyed by metric name and label pairs"""
+
+    def __init__(self, enabled:bool=False, labels:tuple=()):
+        self.enabled:bool = enabled
+        # labels of every series, e.g. the worker
+        self.labels:tuple = labels
+        self.histograms:Dict[str, Dict[tuple, Histogram]] = {}
+        self.counters:Dict[str, Dict[tuple, float]] = {}
+
+    def observe(self, name:str, labels:tuple, seconds:float):
+        series = self.histograms.setdefault(name, {})
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram()
+        histogram.observe(seconds)
+
+    def phase(self, name:str, model, phase:str, started:float)->float:
+        """Observes the time since started in a phase of a model class, returns the clock"""
+        now:float = perf_counter()
+        self.observe(name, (('model', model.__name__), ('phase', phase)), now - started)
+        return now
+
+    def increment(self, name:str, labels:tuple, amount:float=1):
+        series = self.counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0) + amount
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+
+    def render(self)->str:
+        """Renders every series in the Prometheus text exposition format"""
+        lines:list = []
+        for name, series in self.counters.items():
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{format_labels(self.labels + labels)} {value}")
+        for name, series in self.histograms.items():
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series.items():
+                labels = self.labels + labels
+                cumulative:int = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == inf else repr(bound)
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels:tuple)->str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{escape_label(value)}"' for key, value in labels)
+    return '{' + pairs + '}'
+
+
+def escape_label(value)->str:
+    return f"{value}".replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICS = Metrics()
+
+
+def worker_labels()->tuple:
+    """The worker label of a process serving with other workers, their series are kept apart"""
+    if int(os.environ.get(WORKERS_ENV) or 1) > 1:
+        return (('worker', f"{os.getpid()}"),)
+    return ()
+
+
+def route_template(scope)->str:
+    """The path template of the route matching a request, e.g. ``/form/{name}``, a bounded label
+
+    Recent starlette routers leave the matched route in the scope, older ones
+    (0.46) do not, the routes of the app are matched again then. A path no
+    route matches is labelled ``unmatched``.
+    """
+    route = scope.get('route')
+    if route is not None:
+        return route.path
+    from starlette.routing import Match
+    app = scope.get('app')
+    for route in getattr(getattr(app, 'router', app), 'routes', ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, 'path', 'unmatched')
+    return 'unmatched'
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of requests whose path starts with one of prefixes"""
+
+    def __init__(self, app, prefixes:Tuple[str, ...]=('/form',), metrics:Metrics=METRICS):
+        self.app = app
+        self.prefixes = tuple(prefixes)
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if not self.metrics.enabled or scope['type'] != 'http' or not scope['path'].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+        started = perf_counter()
+        status:list = [500]
+
+        async def send_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            labels = (('route', route_template(scope)), ('method', scope['method']), ('status', status[0]))
+            self.metrics.observe(REQUEST_SECONDS, labels, perf_counter() - started)
@@ -0,0 +1,66 @@
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List
+from .form_spec import class_cache, form_spec
+
+## Searchable select fields, json_schema_extra={'options': [...], 'search': True}.
+## Their options are not rendered, the form renders a typeahead input which
+## asks the options route of the form for the options starting with what was
+## typed. Both the search and the validation of the submitted value use the
+## same index, built once per field and class.
+
+# Options sent per page by the options route, and the most a request may ask for
+OPTIONS_PAGE_SIZE:int = 20
+OPTIONS_MAX_PAGE_SIZE:int = 100
+
+OPTION_ERROR:str = 'Input should be one of the {title} options'
+
+
+class OptionIndex:
+    """The options of a field sorted by their case folded text, for prefix search and membership in O(log n)"""
+    __slots__ = ('keys', 'values', 'title')
+
+    def __init__(self, options:Iterable[Any], title:str=None):
+        self.title:str = title
+        pairs:list = sorted((f"{option}".casefold(), f"{option}") for option in options)
+        self.keys:List[str] = [key for key, _ in pairs]
+        self.values:List[str] = [value for _, value in pairs]
+
+    def __len__(self)->int:
+        return len(self.keys)
+
+    def __contains__(self, value:Any)->bool:
+        text:str = f"{value}"
+        folded:str = text.casefold()
+        position:int = bisect_left(self.keys, folded)
+        while position < len(self.keys) and self.keys[position] == folded:
+            if self.values[position] == text:
+                return True
+            position += 1
+        return False
+
+    def search(self, prefix:str, start:int=0, count:int=OPTIONS_PAGE_SIZE)->List[str]:
+        """Returns count options starting with prefix (ignoring case), skipping the first start matches"""
+        folded:str = prefix.casefold()
+        position:int = bisect_left(self.keys, folded) + start
+        matches:list = []
+        while position < len(self.keys) and len(matches) < count and self.keys[position].startswith(folded):
+            matches.append(self.values[position])
+            position += 1
+        return matches
+
+
+def option_indexes(model)->Dict[str, OptionIndex]:
+    """Returns the OptionIndex of each searchable select of a model form by dotted key, built once per class"""
+    cache = class_cache(model)
+    indexes = cache.get('options')
+    if indexes is None:
+        indexes = cache['options'] = {
+            field.key: OptionIndex(field.options, title=field.title)
+            for field in form_spec(model).leaves if field.kind == 'search'
+            }
+    return indexes
+
+
+def is_option(index:OptionIndex, value:Any)->bool:
+    """Checks a submitted value, an empty one (nothing picked) is left to the field's own validation"""
+    return value is None or value == '' or value in index
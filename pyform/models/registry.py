@@ -0,0 +1,44 @@
+from itertools import product
+from typing import Iterator, Optional
+from weakref import WeakValueDictionary
+
+## Registry of the ModelForm subclasses, filled as they are defined, and the
+## warm up of their cached schemas, render plans and validators, so the first
+## request for a form doesn't pay for them.
+
+# "module.QualifiedName" -> ModelForm subclass
+FORMS:WeakValueDictionary = WeakValueDictionary()
+
+
+def register(cls):
+    """Adds a ModelForm subclass to the registry, returns it"""
+    FORMS[f"{cls.__module__}.{cls.__qualname__}"] = cls
+    return cls
+
+
+def registered_forms()->Iterator[type]:
+    """The registered ModelForm subclasses whose definition is complete"""
+    for cls in list(FORMS.values()):
+        if getattr(cls, '__pydantic_complete__', False):
+            yield cls
+
+
+def warm_up(forms:Optional[list]=None, post:str=None, target:str=None, insert:bool=False)->list:
+    """Builds the caches of forms (by default every registered form) for the given render flags
+
+    Returns:
+        list: the warmed up form classes.
+    """
+    warmed:list = []
+    for cls in registered_forms() if forms is None else forms:
+        cls.form_spec()
+        cls.form_layout()
+        for values, errors in product((False, True), repeat=2):
+            cls.render_plan(post=post, target=target, insert=insert, values=values, errors=errors)
+        cls.fieldset_plans()
+        cls.field_validators()
+        cls.option_indexes()
+        cls.upload_limits()
+        cls.constraint_report()
+        warmed.append(cls)
+    return warmed
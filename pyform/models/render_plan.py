@@ -0,0 +1,144 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+from .form_spec import class_cache
+from .form_state import FormState, form_state
+
+
+class Slot(NamedTuple):
+    """A dynamic hole in a form's markup, filled from the form data at render time.
+
+    kind is one of ``csrf``, ``form`` (the debug dump), ``invalid`` (the names
+    of the fields with errors), ``value``, ``error`` or ``options``. An error slot renders ``before + message + after`` when the
+    field has an error and ``absent`` otherwise, an options slot renders the
+    options of the field found in ``form['options']`` or else ``absent``.
+    """
+    kind: str
+    key: Optional[str] = None
+    before: str = ''
+    after: str = ''
+    absent: str = ''
+
+
+# Default size of the body chunks sent by streaming responses
+CHUNK_SIZE:int = 16 * 1024
+
+CSRF = Slot('csrf')
+FORM = Slot('form')
+INVALID = Slot('invalid')
+
+# Name of the hidden input carrying the fields rendered with an error back to the server
+INVALID_FIELD:str = '_invalid'
+
+# Placeholders of the input name and id prefixes in sub form fragments
+NAME_PREFIX:str = '\x00name\x00'
+ID_PREFIX:str = '\x00id\x00'
+
+# Rendered sub form fragments, shared by every form class embedding the sub model
+FRAGMENTS:Dict[tuple, Tuple[Union[str, Slot], ...]] = {}
+
+
+def fill_slot(slot:Slot, form:FormState)->str:
+    """Renders a Slot from a form state, as the f-strings of the renderer would"""
+    if slot.kind == 'csrf':
+        return f"{form.csrf}"
+    if slot.kind == 'form':
+        return f"{form}"
+    if slot.kind == 'invalid':
+        return ','.join(key for key, field in form.fields.items() if field.error)
+    if slot.kind == 'options':
+        options = form.options.get(slot.key) if form.options else None
+        if options is None:
+            return slot.absent
+        return ''.join(f"""<option>{option}</option>""" for option in options)
+    field = form.fields.get(slot.key)
+    if slot.kind == 'value':
+        return f"{field.value}" if field is not None else "None"
+    if field is not None and field.error:
+        return f"{slot.before}{field.error}{slot.after}"
+    return slot.absent
+
+
+class RenderPlan(NamedTuple):
+    """Pre-joined static byte segments of a form interleaved with Slots"""
+    segments: Tuple[Union[bytes, Slot], ...]
+
+    def parts(self, form:FormState)->Iterator[bytes]:
+        form = form_state(form)
+        for segment in self.segments:
+            if segment.__class__ is Slot:
+                yield fill_slot(segment, form).encode()
+            else:
+                yield segment
+
+    def render(self, form:FormState)->bytes:
+        return b''.join(self.parts(form))
+
+    def chunks(self, form:FormState, chunk_size:int=CHUNK_SIZE)->Iterator[bytes]:
+        return coalesce(self.parts(form), chunk_size=chunk_size)
+
+
+def coalesce(parts:Iterable[bytes], chunk_size:int=CHUNK_SIZE)->Iterator[bytes]:
+    """Merges small byte fragments into chunks of at least chunk_size bytes"""
+    buffer = bytearray()
+    for part in parts:
+        buffer += part
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def join_static(segments:Iterable[Union[str, Slot]])->Iterator[Union[str, Slot]]:
+    """Joins adjacent static markup of a segment stream"""
+    static:list = []
+    for segment in segments:
+        if isinstance(segment, Slot):
+            if static:
+                yield ''.join(static)
+                static = []
+            yield segment
+        else:
+            static.append(segment)
+    if static:
+        yield ''.join(static)
+
+
+def fragment(key:tuple, segments:Callable[[], Iterable[Union[str, Slot]]])->Tuple[Union[str, Slot], ...]:
+    """Returns the memoized segments of a sub form fragment, rendering them on the first use of key"""
+    cached = FRAGMENTS.get(key)
+    if cached is None:
+        cached = FRAGMENTS[key] = tuple(join_static(segments()))
+    return cached
+
+
+def splice(segments:Iterable[Union[str, Slot]], name:str, id:str)->Iterator[Union[str, Slot]]:
+    """Yields the segments of a fragment with its name and id prefix placeholders filled"""
+    for segment in segments:
+        if isinstance(segment, Slot):
+            yield segment._replace(
+                key=segment.key.replace(NAME_PREFIX, name) if segment.key else segment.key,
+                before=segment.before.replace(ID_PREFIX, id),
+                absent=segment.absent.replace(ID_PREFIX, id),
+                )
+        else:
+            yield segment.replace(NAME_PREFIX, name).replace(ID_PREFIX, id)
+
+
+def compile_render_plan(segments:Iterable[Union[str, Slot]])->RenderPlan:
+    """Joins adjacent static markup of a segment stream into byte segments"""
+    return RenderPlan(tuple(
+        segment if isinstance(segment, Slot) else segment.encode()
+        for segment in join_static(segments)
+        ))
+
+
+def render_plan(model, post:str=None, target:str=None, insert:bool=False, values:bool=False, errors:bool=False)->RenderPlan:
+    """Returns the cached RenderPlan of a ModelForm class for a flag combination"""
+    key:tuple = ('plan', post, target, insert, values, errors) + model.render_settings()
+    cache:dict = class_cache(model)
+    plan:Any = cache.get(key)
+    if plan is None:
+        plan = cache[key] = compile_render_plan(
+            model.form_segments(post=post, target=target, insert=insert, values=values, errors=errors)
+            )
+    return plan
@@ -0,0 +1,204 @@
+from codecs import lookup
+from typing import Annotated, Any, Dict, Optional
+from pydantic import PlainSerializer, PlainValidator, WithJsonSchema
+from pydantic_core import PydanticCustomError
+from .form_spec import class_cache, form_spec
+
+## File upload fields, json_schema_extra={'file': True, 'max_size': ..., 'accept': ...}.
+## A form with a file field is posted as multipart/form-data. Its body is
+## streamed part by part: the files go to spooled temporary files, kept in
+## memory up to UPLOAD_SPOOL_SIZE and rolled over to disk beyond, so a
+## request holds at most that much of each file in memory. The sizes are
+## checked as the parts arrive, and the Content-Length of the request
+## before any of the body is read. Validation gets the file handles.
+
+# Bytes of a file kept in memory before it rolls over to disk
+UPLOAD_SPOOL_SIZE:int = 256 * 1024
+# Default size limit of a file field, max_size in its json_schema_extra overrides it
+UPLOAD_MAX_SIZE:int = 10 * 1024 * 1024
+# Default size limit of a whole upload form, see ModelForm.max_upload_size
+UPLOAD_MAX_TOTAL_SIZE:int = 50 * 1024 * 1024
+# Size limit of the other (text) parts of an upload form
+UPLOAD_MAX_FIELD_SIZE:int = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """Raised when a file, a part or the whole of an upload form exceeds its size limit"""
+
+    def __init__(self, key:str, limit:int):
+        self.key:str = key
+        self.limit:int = limit
+        super().__init__(f"{key} exceeds the upload limit of {limit} bytes")
+
+
+def _validate_upload(value:Any)->Any:
+    # any file handle with a name, e.g. starlette's UploadFile, validation never imports starlette
+    if value is None or (hasattr(value, 'file') and hasattr(value, 'filename')):
+        return value
+    raise PydanticCustomError('upload', 'Input should be an uploaded file')
+
+
+# The annotation of a file field, Optional[UploadedFile] when the upload is optional.
+# It dumps to the name of the file.
+UploadedFile = Annotated[
+    Any,
+    PlainValidator(_validate_upload),
+    PlainSerializer(lambda value: getattr(value, 'filename', None)),
+    WithJsonSchema({'type': 'string', 'format': 'binary'}),
+    ]
+
+
+def upload_limits(model)->Dict[str, int]:
+    """Returns the size limit of each file field of a model form by dotted key, built once per class"""
+    cache = class_cache(model)
+    limits = cache.get('uploads')
+    if limits is None:
+        limits = cache['uploads'] = {
+            field.key: field.max_size or UPLOAD_MAX_SIZE
+            for field in form_spec(model).leaves if field.kind == 'file'
+            }
+    return limits
+
+
+class UploadParser:
+    """Parses a multipart/form-data body chunk by chunk into form items and spooled files"""
+
+    def __init__(self, limits:Dict[str, int], max_total:int, charset:str='utf-8'):
+        self.limits:Dict[str, int] = limits
+        self.max_total:int = max_total
+        self.charset:str = charset
+        self.total:int = 0
+        self.items:list = []
+        self.files:list = []
+        # the file data of the last chunk, written by flush as the callbacks are synchronous
+        self.pending:list = []
+        self._header:bytes = b''
+        self._value:bytes = b''
+        self._headers:list = []
+        self._key:Optional[str] = None
+        self._file = None
+        self._data:bytearray = bytearray()
+        self._size:int = 0
+        self._limit:int = UPLOAD_MAX_FIELD_SIZE
+
+    def callbacks(self)->dict:
+        return {
+            'on_part_begin': self.on_part_begin,
+            'on_part_data': self.on_part_data,
+            'on_part_end': self.on_part_end,
+            'on_header_field': self.on_header_field,
+            'on_header_value': self.on_header_value,
+            'on_header_end': self.on_header_end,
+            'on_headers_finished': self.on_headers_finished,
+            }
+
+    def on_part_begin(self):
+        self._headers = []
+        self._key = None
+        self._file = None
+        self._data = bytearray()
+        self._size = 0
+
+    def on_header_field(self, data:bytes, start:int, end:int):
+        self._header += data[start:end]
+
+    def on_header_value(self, data:bytes, start:int, end:int):
+        self._value += data[start:end]
+
+    def on_header_end(self):
+        self._headers.append((self._header.lower(), self._value))
+        self._header = self._value = b''
+
+    def on_headers_finished(self):
+        from python_multipart.multipart import parse_options_header
+        from starlette.datastructures import Headers, UploadFile
+        from tempfile import SpooledTemporaryFile
+        disposition:bytes = next((value for name, value in self._headers if name == b'content-disposition'), b'')
+        _, options = parse_options_header(disposition)
+        self._key = options.get(b'name', b'').decode(self.charset, errors='replace')
+        if b'filename' in options:
+            self._limit = self.limits.get(self._key, UPLOAD_MAX_SIZE)
+            self._file = UploadFile(
+                file=SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE),
+                size=0,
+                filename=options[b'filename'].decode(self.charset, errors='replace'),
+                headers=Headers(raw=self._headers),
+                )
+            self.files.append(self._file)
+        else:
+            self._limit = UPLOAD_MAX_FIELD_SIZE
+
+    def on_part_data(self, data:bytes, start:int, end:int):
+        self._size += end - start
+        self.total += end - start
+        if self.total > self.max_total:
+            raise UploadTooLarge('the form', self.max_total)
+        if self._size > self._limit:
+            raise UploadTooLarge(self._key, self._limit)
+        if self._file is None:
+            self._data += data[start:end]
+        else:
+            self.pending.append((self._file, data[start:end]))
+
+    def on_part_end(self):
+        # an empty file input is posted as a nameless empty part (or as an empty text part), as if not sent
+        if self._file is None:
+            if self._data or self._key not in self.limits:
+                self.items.append((self._key, self._data.decode(self.charset, errors='replace')))
+        elif self._file.filename or self._size:
+            self.items.append((self._key, self._file))
+        else:
+            self.files.remove(self._file)
+            self._file.file.close()
+
+    async def flush(self):
+        """Writes the file data of the chunk parsed last, rolled over files are written in a thread"""
+        pending, self.pending = self.pending, []
+        for file, data in pending:
+            await file.write(data)
+
+
+async def read_form(request, limits:Dict[str, int], max_total:int=UPLOAD_MAX_TOTAL_SIZE):
+    """Reads the form data of a request, streaming the files of an upload form to spooled temporary files
+
+    A form without file fields (limits empty) is read by starlette as usual.
+
+    Raises:
+        UploadTooLarge: as soon as the Content-Length, a file or the parts read so far exceed their limit.
+    """
+    if not limits:
+        return await request.form()
+    from python_multipart.multipart import MultipartParser, parse_options_header
+    from starlette.datastructures import FormData
+    length:str = request.headers.get('content-length', '')
+    if length.isdigit() and int(length) > max_total:
+        # rejected before any of the body is read
+        raise UploadTooLarge('the form', max_total)
+    content_type, params = parse_options_header(request.headers.get('content-type', ''))
+    if content_type != b'multipart/form-data' or b'boundary' not in params:
+        return await request.form()
+    try:
+        charset:str = lookup(params.get(b'charset', b'utf-8').decode('latin-1')).name
+    except LookupError:
+        charset = 'latin-1'
+    parser:UploadParser = UploadParser(limits, max_total, charset=charset)
+    multipart = MultipartParser(params[b'boundary'], parser.callbacks())
+    try:
+        async for chunk in request.stream():
+            multipart.write(chunk)
+            await parser.flush()
+        multipart.finalize()
+    except BaseException:
+        for file in parser.files:
+            await file.close()
+        raise
+    for file in parser.files:
+        await file.seek(0)
+    return FormData(parser.items)
+
+
+async def close_uploads(data):
+    """Closes the files of form data read by read_form"""
+    for _, value in data.multi_items():
+        if hasattr(value, 'file') and hasattr(value, 'close'):
+            await value.close()
@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from secrets import token_hex
+from time import perf_counter
+from typing import NamedTuple, Tuple
+from starlette.requests import Request
+from starlette.responses import Response
+try:
+    from pyform.models.form_state import form_state
+    from pyform.models.metrics import METRICS, RENDER_SECONDS, RENDERS_TOTAL, format_labels
+except ImportError:
+    from models.form_state import form_state
+    from models.metrics import METRICS, RENDER_SECONDS, RENDERS_TOTAL, format_labels
+
+## A bounded LRU cache of rendered ModelForm pages.
+## Pages are cached per (model class, post, target, insert) with the csrf token
+## cut out, the token of the current request is spliced back in on every hit.
+
+
+class CachedForm(NamedTuple):
+    """A rendered form split around its csrf token"""
+    plan: object
+    pieces: Tuple[bytes, ...]
+    digest: bytes
+
+
+class FormResponseCache:
+    """LRU cache of rendered forms with strong ETags and 304 responses"""
+
+    def __init__(self, maxsize:int=128):
+        self.maxsize = maxsize
+        self.hits:int = 0
+        self.misses:int = 0
+        self.evictions:int = 0
+        self._entries:OrderedDict = OrderedDict()
+        self._marker:str = f"__pyform_csrf_{token_hex(8)}__"
+
+    def __len__(self)->int:
+        return len(self._entries)
+
+    def stats(self)->dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            }
+
+    def clear(self):
+        self._entries.clear()
+
+    def prometheus(self, name:str='pyform_response_cache', labels:tuple=())->str:
+        """Renders the counters of the cache in the Prometheus text format
+
+        Args:
+            labels (tuple, optional): label pairs of every series, e.g. the worker.
+        """
+        lines:list = []
+        for counter in ('hits', 'misses', 'evictions'):
+            lines.append(f"# TYPE {name}_{counter}_total counter")
+            lines.append(f"{name}_{counter}_total{format_labels(labels)} {getattr(self, counter)}")
+        lines.append(f"# TYPE {name}_size gauge")
+        lines.append(f"{name}_size{format_labels(labels)} {len(self._entries)}")
+        return '\n'.join(lines) + '\n'
+
+    def get(self, model, form:dict, post:str=None, target:str=None, insert:bool=False)->CachedForm:
+        """Returns the cached rendering of a model form, rendering it on a miss"""
+        key:tuple = (model.__class__, post, target, insert)
+        plan = model.render_plan(post=post, target=target, insert=insert)
+        entry:CachedForm = self._entries.get(key)
+        # a rebuilt model class compiles a new plan, which invalidates the entry
+        if entry is not None and entry.plan is plan:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        started:float = perf_counter() if METRICS.enabled else 0.0
+        page:bytes = plan.render(form_state(form).replace(csrf=self._marker))
+        if started:
+            METRICS.phase(RENDER_SECONDS, model.__class__, 'generate', started)
+        entry = CachedForm(plan=plan, pieces=tuple(page.split(self._marker.encode())), digest=blake2b(page, digest_size=16).digest())
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def form_response(self, request:Request, model, form:dict, post:str=None, target:str=None, insert:bool=False)->Response:
+        """Returns the html response of a model form, or a 304 if the client's copy is current
+
+        The page must only depend on the model class, the flags and the csrf token,
+        e.g. the form of a default model instance.
+        """
+        started:float = perf_counter() if METRICS.enabled else 0.0
+        entry:CachedForm = self.get(model, form, post=post, target=target, insert=insert)
+        if started:
+            METRICS.phase(RENDER_SECONDS, model.__class__, 'total', started)
+            METRICS.increment(RENDERS_TOTAL, (('model', model.__class__.__name__),))
+        token:bytes = f"{form_state(form).csrf}".encode()
+        etag:str = f'"{blake2b(entry.digest + token, digest_size=16).hexdigest()}"'
+        headers:dict = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(token.join(entry.pieces), media_type='text/html', headers=headers)
+
+
+def etag_matches(if_none_match:str, etag:str)->bool:
+    """Checks an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+from secrets import token_urlsafe
 from typing import Any
 from starlette.applications import Starlette
 from starlette.middleware import Middleware
@@ -6,34 +8,97 @@ from starlette_wtf import CSRFProtectMiddleware
 from starlette.middleware.cors import CORSMiddleware
 from starlette.routing import Route, Mount
 from starlette.staticfiles import StaticFiles
-from config import STATIC_PATH, Path, NETWORK_CONFIG, TEMPLATES
+from starlette.responses import PlainTextResponse
+import config
+from config import STATIC_PATH, Path, NETWORK_CONFIG, RESPONSE_CACHE_SIZE, METRICS_ENABLED
+from response_cache import FormResponseCache
 from tests.test_models import MyForm
+try:
+    from pyform.models.batch import shutdown_pools
+    from pyform.models.metrics import METRICS, MetricsMiddleware, worker_labels
+    from pyform.models.registry import warm_up
+    from pyform.models.form_store import load_store
+except ImportError:
+    from models.batch import shutdown_pools
+    from models.metrics import METRICS, MetricsMiddleware, worker_labels
+    from models.registry import warm_up
+    from models.form_store import load_store
+
+FORM_CACHE = FormResponseCache(maxsize=RESPONSE_CACHE_SIZE)
+# render flags of the forms served at /form
+FORM_FLAGS:dict = {'post': '/form', 'target': "form", 'insert': True}
+MyForm.field_check = '/form/field'
+MyForm.options_url = '/form/options'
+METRICS.enabled = METRICS_ENABLED
 
 async def homepage(request):
-    return TEMPLATES.TemplateResponse("index.html", {"request": request})
+    return config.TEMPLATES.TemplateResponse("index.html", {"request": request})
+
+
+def session_csrf(request)->str:
+    """The csrf token of the client's session, one per session so the cached form keeps its ETag"""
+    token = request.session.get('csrf')
+    if token is None:
+        token = request.session['csrf'] = token_urlsafe(16)
+    return token
 
 
 async def getpostform(request):
     if request.method == 'POST':
-        data:Any = await MyForm().validateForm(request=request, schema=MyForm)
+        data:Any = await MyForm().validateForm(request=request, schema=MyForm, fragments='hx-request' in request.headers)
         return data
     else:
         model = MyForm()
-        form = model.data_form(request=request)
-        html = model.html_form(post='/form', target="form", insert=True, form=form)
-        return  html        
+        form = model.data_form(request=request, csrf=session_csrf(request))
+        return FORM_CACHE.form_response(request, model, form, **FORM_FLAGS)
+
+
+async def fieldcheck(request):
+    return await MyForm.field_response(request)
+
+
+async def optionsform(request):
+    return await MyForm.options_response(request)
+
+
+async def batchform(request):
+    return await MyForm.batch_response(request=request)
+
+
+async def metrics(request):
+    # the series of this worker only, labelled with its pid when there are several
+    return PlainTextResponse(METRICS.render() + FORM_CACHE.prometheus(labels=METRICS.labels), media_type="text/plain; version=0.0.4")
      
 
+@asynccontextmanager
+async def lifespan(app):
+    # build the templates and the schemas, render plans and validators of
+    # every registered form before the first request comes in, under
+    # python -m pyform serve the plans are mapped from the launcher's store
+    config.TEMPLATES
+    app.state.form_store = load_store()
+    METRICS.labels = worker_labels()
+    warm_up(**FORM_FLAGS)
+    yield
+    shutdown_pools()
+
+
 router = [
     Route("/", homepage),
     Route("/form", getpostform, methods=["GET", "POST"]),
+    Route("/form/batch", batchform, methods=["POST"]),
+    Route("/form/field", fieldcheck, methods=["POST"]),
+    Route("/form/options", optionsform),
+    Route("/metrics", metrics),
     Mount("/static", StaticFiles(directory=STATIC_PATH), name="static"),
     ]  
 
 app = Starlette(
     debug=NETWORK_CONFIG.get('debug'),
     routes=router,
+    lifespan=lifespan,
     middleware=[
+        Middleware(MetricsMiddleware, prefixes=("/form",)),
         Middleware(SessionMiddleware, secret_key="!secret"),
         Middleware(CSRFProtectMiddleware, csrf_secret="!secret"),
         Middleware(
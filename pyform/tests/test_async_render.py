@@ -0,0 +1,51 @@
+import asyncio
+from typing import Any
+from pydantic import Field
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from pyform.models.form_models import ModelForm
+
+
+async def product_source(model, request):
+    await asyncio.sleep(0)
+    return {'options': ['A-1', 'B-2']}
+
+
+async def owner_source(model, request):
+    return {'value': request.query_params.get('owner') if request else 'nobody'}
+
+
+class ProductForm(ModelForm):
+    form_sources = {'product': product_source, 'owner': owner_source}
+    owner: str = Field(default=None, title='Owner')
+    product: Any = Field(default=None, title='Product', json_schema_extra={'options': []})
+
+
+async def collect(model:ModelForm, **kwargs)->bytes:
+    return b''.join([chunk async for chunk in model.agenerate_html_form(**kwargs)])
+
+
+def test_async_sources_fill_options_and_values():
+    body = asyncio.run(collect(ProductForm(), values=True, chunk_size=64)).decode()
+    assert '<option value="" disabled selected>Pick a Product</option><option>A-1</option><option>B-2</option> </select>' in body
+    assert 'value="nobody"' in body
+
+
+def test_async_render_matches_sync_render():
+    form = ProductForm()
+    data = form.data_form()
+    resolved = asyncio.run(form.aresolve_sources(data))
+    assert asyncio.run(collect(form, form=data, values=True)) == form.render_form(form=resolved, values=True)
+    # without the resolved options the static (empty) options are rendered
+    assert '<option value="" disabled selected>Pick a Product</option> </select>' in form.form_template(form=data)
+
+
+def test_stream_html_form_iterates_on_the_event_loop():
+    def stream(request):
+        response = ProductForm().stream_html_form(values=True, request=request)
+        assert hasattr(response.body_iterator, '__anext__')
+        return response
+
+    client = TestClient(Starlette(routes=[Route('/', stream)]))
+    assert 'value="ann"' in client.get('/', params={'owner': 'ann'}).text
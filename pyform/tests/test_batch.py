@@ -0,0 +1,112 @@
+import json
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from pyform.tests.test_models import MyForm
+
+VALID:dict = {
+    'name': 'Al', 'age': 33, 'is_admin': True, 'volume': 2,
+    'contact': {'tel': 500, 'email': 'al@example.com'},
+    'address': {'lot': 5, 'street': 'Baker', 'parish': 'kingston'},
+    }
+CSV:str = (
+    'name,age,is_admin,volume,contact.tel,contact.email,address.lot,address.street,address.parish\r\n'
+    'Al,33,true,2,500,al@example.com,5,Baker,kingston\r\n'
+    'Al,3,true,2,5000,al@example.com,5,Baker,kingston\r\n'
+    )
+
+
+async def batch(request):
+    return await MyForm.batch_response(request=request, chunk_size=2)
+
+client = TestClient(Starlette(routes=[Route('/batch', batch, methods=['POST'])]))
+
+
+def test_validate_batch_reports_each_row():
+    results = list(MyForm.validate_batch([VALID, {**VALID, 'age': 3}, json.dumps(VALID)], chunk_size=2))
+    assert [(result['row'], result['ok']) for result in results] == [(0, True), (1, False), (2, True)]
+    assert results[0]['data'] == VALID
+    assert results[1]['errors'] == {'age': 'Value error, must be older than 3 !'}
+
+
+def test_validate_csv_maps_flat_columns():
+    results = list(MyForm.validate_csv(CSV.splitlines(keepends=True)))
+    # volume is an Any field, csv cells stay strings
+    assert results[0]['ok'] and results[0]['data'] == {**VALID, 'volume': '2'}
+    assert results[1]['errors'] == {
+        'age': 'Value error, must be older than 3 !',
+        'contact.tel': 'Input should be less than or equal to 1000',
+        }
+
+
+def test_validate_batch_in_process_pool():
+    rows = [VALID, {**VALID, 'age': 3}] * 3
+    results = list(MyForm.validate_batch(rows, processes=2, chunk_size=2))
+    assert [result['ok'] for result in results] == [True, False] * 3
+    assert [result['row'] for result in results] == list(range(6))
+
+
+def test_batch_response_streams_ndjson():
+    body = '\n'.join([json.dumps(VALID), '', json.dumps({**VALID, 'age': 3}), '{not json'])
+    response = client.post('/batch', content=body, headers={'content-type': 'application/x-ndjson'})
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result['ok'] for result in results] == [True, False, False]
+    assert results[2]['row'] == 2 and list(results[2]['errors']) == ['']
+
+
+def test_batch_response_reads_csv_uploads():
+    response = client.post('/batch', files={'file': ('rows.csv', CSV, 'text/csv')})
+    assert [json.loads(line)['ok'] for line in response.text.splitlines()] == [True, False]
+    response = client.post('/batch', content=CSV, headers={'content-type': 'text/csv'})
+    assert [json.loads(line)['ok'] for line in response.text.splitlines()] == [True, False]
+
+
+def test_batch_response_validates_off_the_event_loop(monkeypatch):
+    import threading
+    from pyform.models import batch as batch_module
+    threads:set = set()
+    validate_chunk = batch_module.validate_chunk
+
+    def recording(model, start, rows):
+        threads.add(threading.get_ident())
+        return validate_chunk(model, start, rows)
+
+    async def loop_batch(request):
+        loop_threads.add(threading.get_ident())
+        return await batch(request)
+
+    loop_threads:set = set()
+    monkeypatch.setattr(batch_module, 'validate_chunk', recording)
+    loop_client = TestClient(Starlette(routes=[Route('/batch', loop_batch, methods=['POST'])]))
+    response = loop_client.post('/batch', content=CSV, headers={'content-type': 'text/csv'})
+    assert [json.loads(line)['ok'] for line in response.text.splitlines()] == [True, False]
+    assert threads and loop_threads and not threads & loop_threads
+
+
+def test_process_pool_is_shared_until_shutdown():
+    import asyncio
+    import threading
+    from pyform.models.batch import POOLS, avalidate_rows, process_pool, shutdown_pools
+    threads:set = set()
+
+    def rows():
+        for row in [VALID, {**VALID, 'age': 3}]:
+            threads.add(threading.get_ident())
+            yield row
+
+    async def collect():
+        loop_threads.add(threading.get_ident())
+        return [chunk async for chunk in avalidate_rows(MyForm, rows(), processes=2, chunk_size=1)]
+
+    loop_threads:set = set()
+    try:
+        assert len(asyncio.run(collect())) == 2
+        pool = process_pool(2)
+        assert len(asyncio.run(collect())) == 2 and process_pool(2) is pool
+        # the rows are read off the event loop
+        assert threads and not threads & loop_threads
+        # as by validate_batch, in the same pool
+        assert len(list(MyForm.validate_batch(rows(), processes=2, chunk_size=1))) == 2 and process_pool(2) is pool
+    finally:
+        shutdown_pools()
+    assert not POOLS
@@ -0,0 +1,23 @@
+from pyform.benchmarks.bench_forms import Scenario, build_form, compare, form_data, run
+
+
+def test_build_form_generates_the_requested_shape():
+    model = build_form(Scenario(20, depth=1, options=3))
+    assert len(model.form_layout().paths) == 20
+    assert model.form_spec().groups[0].fields[3].options == ('option 0', 'option 1', 'option 2')
+    assert model.model_validate(model.form_layout().payload(form_data(model)))
+
+
+def test_run_reports_every_metric():
+    results = run([Scenario(10)], number=1)
+    assert set(results['results']['fields10-depth0-options10']) == {
+        'generate_html_form', 'html_form', 'stream_html_form', 'data_form',
+        'validate_field', 'validate_form_per_second', 'html_form_peak_bytes',
+        }
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {'results': {'s': {'html_form': 1.0, 'data_form': 1.0, 'validate_form_per_second': 100}}}
+    results = {'results': {'s': {'html_form': 1.4, 'data_form': 2.0, 'validate_form_per_second': 50}}}
+    regressions = compare(results, baseline, threshold=1.5)
+    assert [(item['metric'], item['ratio']) for item in regressions] == [('data_form', 2.0), ('validate_form_per_second', 2.0)]
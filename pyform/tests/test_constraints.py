@@ -0,0 +1,92 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+from pyform.models.constraints import compile_constraints, constraint_attributes
+from pyform.models.form_models import ModelForm
+from pyform.tests.test_models import MyForm
+
+
+class Parcel(BaseModel):
+    weight: float = Field(default=None, gt=0, le=30, title='Weight')
+    code: str = Field(default=None, pattern=r'^[A-Z]{2}\d{4}$', title='Code')
+
+
+class ShipForm(ModelForm):
+    note: Optional[str] = Field(default=None, max_length=80, title='Note')
+    crates: int = Field(default=None, ge=5, multiple_of=5, title='Crates')
+    ref: str = Field(title='Ref', pattern=r'\d+')
+    tag: str = Field(default=None, pattern=r'(?P<tag>\w+)', title='Tag')
+    speed: Literal['slow', 'fast'] = Field(default='slow', title='Speed')
+    parcel: Parcel = Parcel()
+
+
+def constraints(prop:dict, required:bool=False)->tuple:
+    attributes, unexpressed = compile_constraints(prop, required=required)
+    return dict(attributes), unexpressed
+
+
+def test_schema_constraints_become_html_attributes():
+    assert constraints({'type': 'integer', 'exclusiveMinimum': 0, 'maximum': 120}) == (
+        {'type': 'number', 'required': None, 'min': '1', 'max': '120', 'step': 1}, ())
+    assert constraints({'type': 'number', 'exclusiveMinimum': 0.5}) == ({'required': None, 'min': '0.5'}, ('exclusiveMinimum',))
+    assert constraints({'type': 'string', 'format': 'email'}) == ({'type': 'email', 'required': None}, ())
+    assert constraints({'type': 'string', 'format': 'uuid'}) == ({}, ('format',))
+    assert constraints({'type': 'string', 'maxLength': 9}, required=True) == ({'required': None, 'maxlength': 9}, ())
+    # optional inputs may be left empty
+    assert constraints({'anyOf': [{'type': 'integer', 'minimum': 2}, {'type': 'null'}]}) == ({'type': 'number', 'min': '2', 'step': 1}, ())
+    assert constraints({'type': 'integer', 'minimum': 3, 'multipleOf': 5}) == ({'type': 'number', 'required': None, 'min': '3'}, ('multipleOf',))
+
+
+def test_patterns_match_like_pydantic():
+    assert constraints({'type': 'string', 'pattern': '^a+$'})[0]['pattern'] == '^a+$'
+    # pydantic searches, the browser matches the whole value
+    assert constraints({'type': 'string', 'pattern': 'a+'})[0]['pattern'] == '.*(?:a+).*'
+    assert constraints({'type': 'string', 'pattern': r'\Aa'}) == ({'required': None}, ('pattern',))
+    # an empty value matching the pattern is valid
+    assert constraints({'type': 'string', 'pattern': '^a*$'}) == ({'pattern': '^a*$'}, ())
+    assert constraint_attributes((('pattern', '"a"'), ('required', None))) == ' pattern="&quot;a&quot;" required'
+
+
+def test_form_inputs_carry_their_constraints():
+    body = ShipForm.model_construct().form_template()
+    assert 'name="note" id="note" placeholder="Note" maxlength="80"  />' in body
+    assert 'name="tag" id="tag" placeholder="Tag" required  />' in body
+    assert 'type="number" name="crates" id="crates" placeholder="Crates" required min="5" step="5"  />' in body
+    assert 'name="ref" id="ref" placeholder="Ref" required pattern=".*(?:\\d+).*"  />' in body
+    assert 'type="number" step="0.001" name="parcel.weight" id="parcel-weight" placeholder="Weight" required min="0" max="30"  />' in body
+    assert 'name="parcel.code" id="parcel-code" placeholder="Code" required pattern="^[A-Z]{2}\\d{4}$"  />' in body
+    body = MyForm().form_template()
+    assert 'type="email" name="contact.email" id="contact-email" placeholder="Email" required  />' in body
+    assert 'type="number" name="age" id="age" placeholder="Age" required min="1" max="120" step="1"  />' in body
+
+
+def test_report_lists_the_constraints_left_to_the_server():
+    assert ShipForm.constraint_report() == {
+        'tag': ('pattern',),
+        'speed': ('enum',),
+        'parcel.weight': ('exclusiveMinimum',),
+        }
+    assert MyForm.constraint_report() == {'age': ('validator age_must_be_over_30',)}
+
+
+def test_required_selects_start_on_an_empty_placeholder():
+    class PickForm(ModelForm):
+        parish: str = Field(title='Parish', json_schema_extra={'options': ['Kingston', 'Manchester']})
+
+    body = PickForm.model_construct().form_template()
+    assert '<select name="parish" id="parish" class="select" required>' in body
+    # only an empty valued first option is the placeholder the required check rejects
+    assert '<option value="" disabled selected>Pick a Parish</option>' in body
+
+
+def test_optional_sub_forms_have_no_required_inputs():
+    class DropForm(ModelForm):
+        parcel: Parcel = Parcel()
+        spare: Optional[Parcel] = None
+        extras: List[Parcel] = []
+
+    body = DropForm().form_template()
+    assert 'name="parcel.code" id="parcel-code" placeholder="Code" required pattern=' in body
+    # left blank the sub form is None, or no list item, see FormLayout.payload
+    assert 'name="spare.code" id="spare-code" placeholder="Code" pattern=' in body
+    assert 'name="extras.0.weight" id="extras-0-weight" placeholder="Weight" min="0" max="30"  />' in body
+    assert [field.key for field in DropForm.form_spec().leaves if ('required', None) in field.constraints] == ['parcel.weight', 'parcel.code']
@@ -0,0 +1,64 @@
+from pydantic import Field, field_validator
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from pyform.models.field_validation import field_validators
+from pyform.models.form_models import ModelForm
+from pyform.tests.test_models import MyForm
+
+
+class CheckedForm(MyForm):
+    field_check = '/field'
+
+
+async def check(request):
+    return await CheckedForm.field_response(request)
+
+client = TestClient(Starlette(routes=[Route('/field', check, methods=['POST'])]))
+
+
+def test_validate_field_runs_only_that_field():
+    assert MyForm.validate_field('age', '3') == 'Value error, must be older than 3 !'
+    assert MyForm.validate_field('age', '33') is None
+    assert MyForm.validate_field('contact.tel', '5000') == 'Input should be less than or equal to 1000'
+    assert MyForm.validate_field('address.street', 'Baker') is None
+    assert field_validators(MyForm) is field_validators(MyForm)
+
+
+def test_field_response_returns_the_error_fragment():
+    response = client.post('/field', data={'csrf': 'tok', 'contact.tel': '5000'})
+    assert response.text == '<div class="text-xs text-red-500 font-semibold" id="contact-tel-error">Input should be less than or equal to 1000</div>'
+    assert client.post('/field', data={'csrf': 'tok', 'age': '33'}).text == '<div id="age-error"></div>'
+    assert client.post('/field', data={'csrf': 'tok', 'nope': '1'}).status_code == 400
+
+
+def test_inputs_post_their_value_on_change():
+    body = CheckedForm().form_template(values=True, errors=True)
+    assert 'hx-post="/field" hx-trigger="change" hx-params="csrf,contact.tel" hx-target="#contact-tel-error" hx-swap="outerHTML"' in body
+    assert '</label><div id="contact-tel-error"></div></fieldset>' in body
+    assert 'hx-post="/field"' not in MyForm().form_template()
+
+
+class PasswordForm(ModelForm):
+    password: str = Field(default=None, min_length=8, title='Password')
+    confirm: str = Field(default=None, title='Confirm')
+
+    @field_validator('confirm')
+    @classmethod
+    def check_confirm(cls, value, info):
+        if value != info.data.get('password'):
+            raise ValueError('passwords do not match')
+        return value
+
+
+def test_field_validators_share_no_values_between_calls():
+    assert PasswordForm.validate_field('password', 'secret-of-user-A') is None
+    # another client's check never sees the password validated before
+    assert PasswordForm.validate_field('confirm', 'secret-of-user-A') == 'Value error, passwords do not match'
+    assert PasswordForm.validate_field('password', 'short') == 'String should have at least 8 characters'
+
+
+def test_unknown_field_names_are_not_reflected_as_html():
+    response = client.post('/field', data={'csrf': 'tok', '<img src=x onerror=alert(1)>': '1'})
+    assert response.status_code == 400
+    assert response.headers['content-type'].startswith('text/plain')
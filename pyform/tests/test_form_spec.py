@@ -0,0 +1,53 @@
+from pydantic import Field
+from pyform.models.form_models import ModelForm
+from pyform.models.form_spec import FieldSpec, form_spec
+from pyform.tests.test_models import MyForm
+
+
+def test_spec_resolves_nested_paths():
+    spec = MyForm.form_spec()
+    assert spec.title == 'MyForm'
+    assert [field.name for field in spec.fields] == ['name', 'age', 'is_admin', 'volume', 'contact', 'address']
+    assert spec.fields[3].kind == 'range' and spec.fields[3].bounds == (0, 10, 1)
+    assert spec.fields[4].kind == 'model' and spec.fields[4].ref == 'Contact'
+    parish:FieldSpec = spec.defs['Address'].fields[2]
+    assert parish.kind == 'select' and parish.path == ('parish',)
+    assert parish.options == ('St. Catherine', 'kingston', 'Manchester')
+    assert [field.key for field in spec.leaves][4:] == [
+        'contact.tel', 'contact.email', 'address.lot', 'address.street', 'address.parish',
+        ]
+
+
+def test_spec_is_built_once_per_class(monkeypatch):
+    calls = []
+    original = MyForm.model_json_schema.__func__
+
+    def counting(cls, *args, **kwargs):
+        calls.append(cls)
+        return original(cls, *args, **kwargs)
+
+    MyForm.form_spec()
+    monkeypatch.setattr(MyForm, 'model_json_schema', classmethod(counting))
+    form = MyForm()
+    form.data_form()
+    list(form.generate_html_form())
+    assert form.formfields == {'contact.tel', 'contact.email', 'address.lot', 'address.street', 'address.parish'}
+    assert calls == []
+
+
+def test_json_schema_copies_are_not_shared():
+    schema = MyForm().json_schema
+    schema['properties'].clear()
+    schema['$defs']['Address']['properties']['street']['maxLength'] = 1
+    assert MyForm().json_schema == MyForm.model_json_schema()
+    assert 'name="address.street" id="address-street" placeholder="Street" required maxlength="36" minlength="3"' in MyForm().form_template()
+
+
+def test_spec_is_invalidated_on_rebuild():
+    class Rebuilt(ModelForm):
+        title: str = Field(default=None, title='Title')
+
+    first = form_spec(Rebuilt)
+    assert form_spec(Rebuilt) is first
+    Rebuilt.model_rebuild(force=True)
+    assert form_spec(Rebuilt) is not first
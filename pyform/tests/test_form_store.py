@@ -0,0 +1,72 @@
+import shutil
+from typing import Any
+from pydantic import Field
+from pyform.__main__ import prepare_store
+from pyform.models.form_models import ModelForm
+from pyform.models.form_spec import class_cache
+from pyform.models.form_store import FormStore, cached_plans, write_store
+from pyform.models.metrics import METRICS
+from pyform.models.registry import warm_up
+from pyform.tests.test_models import Address, Contact
+
+FORM:dict = {'csrf': 'tok', 'fields': {'contact.tel': {'name': 'contact.tel', 'error': 'Too big', 'value': '5000'}}}
+
+
+class StoredForm(ModelForm):
+    name: str = Field(default=None, title='Name')
+    kind: Any = Field(default=None, title='Kind', json_schema_extra={'options': ['a', 'b']})
+    contact: Contact = Contact()
+    address: Address = Address()
+
+
+def test_workers_render_from_the_mapped_store(tmp_path):
+    warm_up([StoredForm], post='/form', target='form', insert=True)
+    expected = StoredForm().render_form(post='/form', target='form', insert=True, form=FORM, values=True, errors=True)
+    statics = [segment for plan in cached_plans(StoredForm).values() if hasattr(plan, 'segments') for segment in plan.segments if isinstance(segment, bytes)]
+    size = write_store(tmp_path / 'forms.store', [StoredForm])
+    # static runs shared between plans are stored once
+    assert 0 < size < sum(len(segment) for segment in statics)
+
+    class_cache(StoredForm).clear()
+    store = FormStore(tmp_path / 'forms.store')
+    assert store.install() == [StoredForm]
+    plan = StoredForm.render_plan(post='/form', target='form', insert=True, values=True, errors=True)
+    assert any(isinstance(segment, memoryview) for segment in plan.segments)
+    assert StoredForm().render_form(post='/form', target='form', insert=True, form=FORM, values=True, errors=True) == expected
+    assert all(isinstance(segment, memoryview) for plan in StoredForm.fieldset_plans().values() for segment in plan.segments if not isinstance(segment, tuple))
+    class_cache(StoredForm).clear()
+
+
+def test_changed_forms_are_not_installed(tmp_path):
+    warm_up([StoredForm])
+    write_store(tmp_path / 'forms.store', [StoredForm])
+    store = FormStore(tmp_path / 'forms.store')
+    name = f"{StoredForm.__module__}.{StoredForm.__qualname__}"
+    store.index[name] = ('other schema', store.index[name][1])
+    assert store.install() == []
+
+
+def test_launcher_prepares_the_store_of_the_server_forms(tmp_path, monkeypatch):
+    # importing the server enables the metrics
+    monkeypatch.setattr(METRICS, 'enabled', METRICS.enabled)
+    path = prepare_store(tmp_path / 'server.store')
+    assert 'tests.test_models.MyForm' in FormStore(path).index
+
+
+def test_launcher_stores_in_a_private_directory_per_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(METRICS, 'enabled', METRICS.enabled)
+    first, second = prepare_store(), prepare_store()
+    try:
+        assert first.parent != second.parent
+        assert first.parent.stat().st_mode & 0o777 == 0o700
+    finally:
+        for path in (first, second):
+            # only the directories made for the runs
+            if path.parent.name.startswith('pyform-'):
+                shutil.rmtree(path.parent)
+    # a planted link next to the store is never written through
+    target = tmp_path / 'target'
+    target.write_bytes(b'')
+    (tmp_path / 'forms.store.partial').symlink_to(target)
+    write_store(tmp_path / 'forms.store', [StoredForm])
+    assert target.read_bytes() == b''
@@ -0,0 +1,79 @@
+import asyncio
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from pyform.models.metrics import METRICS, Metrics, MetricsMiddleware
+from pyform.tests.test_models import MyForm
+
+
+def test_disabled_metrics_record_nothing():
+    METRICS.reset()
+    MyForm().render_form()
+    assert METRICS.histograms == {} and METRICS.counters == {}
+
+
+def test_render_phases_are_recorded_per_model():
+    METRICS.reset()
+    METRICS.enabled = True
+    try:
+        MyForm().render_form()
+        async def stream():
+            return [chunk async for chunk in MyForm().agenerate_html_form()]
+        asyncio.run(stream())
+    finally:
+        METRICS.enabled = False
+    phases = {dict(labels)['phase']: histogram.count for labels, histogram in METRICS.histograms['pyform_render_phase_seconds'].items()}
+    assert phases == {'schema': 2, 'data_form': 2, 'generate': 1, 'total': 2, 'first_byte': 1}
+    assert METRICS.counters['pyform_renders_total'] == {(('model', 'MyForm'),): 2}
+
+
+def test_prometheus_text_and_middleware():
+    metrics = Metrics(enabled=True)
+
+    async def form(request):
+        return PlainTextResponse('form')
+
+    async def exposition(request):
+        return PlainTextResponse(metrics.render())
+
+    app = Starlette(
+        routes=[Route('/form/{name}', form), Route('/metrics', exposition)],
+        middleware=[Middleware(MetricsMiddleware, prefixes=('/form',), metrics=metrics)],
+        )
+    client = TestClient(app)
+    client.get('/form/one')
+    client.get('/form/two')
+    text = client.get('/metrics').text
+    assert '# TYPE pyform_request_seconds histogram' in text
+    assert 'pyform_request_seconds_bucket{route="/form/{name}",method="GET",status="200",le="+Inf"} 2' in text
+    assert 'pyform_request_seconds_count{route="/form/{name}",method="GET",status="200"} 2' in text
+    assert 'route="/metrics"' not in text
+
+
+def test_route_template_without_a_route_in_the_scope():
+    from pyform.models.metrics import route_template
+    app = Starlette(routes=[Route('/form/{name}', PlainTextResponse), Route('/metrics', PlainTextResponse)])
+    # the scope of starlette 0.46, which does not record the matched route
+    scope = {'type': 'http', 'method': 'GET', 'path': '/form/one', 'root_path': '', 'app': app}
+    assert route_template(scope) == '/form/{name}'
+    assert route_template({**scope, 'path': '/nope/1'}) == 'unmatched'
+
+
+def test_worker_label_keeps_the_series_of_each_worker_apart(monkeypatch):
+    import os
+    from pyform.models.metrics import WORKERS_ENV, worker_labels
+    from pyform.response_cache import FormResponseCache
+    monkeypatch.delenv(WORKERS_ENV, raising=False)
+    assert worker_labels() == ()
+    monkeypatch.setenv(WORKERS_ENV, '4')
+    labels = worker_labels()
+    assert labels == (('worker', f"{os.getpid()}"),)
+    metrics = Metrics(enabled=True, labels=labels)
+    metrics.increment('pyform_renders_total', (('model', 'MyForm'),))
+    metrics.observe('pyform_request_seconds', (('route', '/form'),), 0.001)
+    text = metrics.render()
+    assert f'pyform_renders_total{{worker="{os.getpid()}",model="MyForm"}} 1' in text
+    assert f'pyform_request_seconds_count{{worker="{os.getpid()}",route="/form"}} 1' in text
+    assert f'pyform_response_cache_hits_total{{worker="{os.getpid()}"}} 0' in FormResponseCache().prometheus(labels=labels)
@@ -0,0 +1,99 @@
+import re
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from pyform.models.form_models import ModelForm
+from pyform.models.render_plan import FRAGMENTS
+from pyform.tests.test_models import Address, Contact
+
+
+class Phone(BaseModel):
+    tel: int = Field(default=None, gt=0, le=1000, title="Tel")
+
+
+class Site(BaseModel):
+    tel: int = Field(default=None, gt=0, le=99, title="Tel")
+    address: Address = Address()
+    phones: List[Phone] = [Phone()]
+
+
+class Node(BaseModel):
+    label: str = Field(default=None, title='Label')
+    child: Optional['Node'] = None
+
+
+class SiteForm(ModelForm):
+    name: str = Field(default=None, title='Name')
+    contact: Contact = Contact()
+    site: Site = Site()
+    backup: Optional[Site] = None
+
+
+class HomeForm(ModelForm):
+    home: Address = Address()
+
+
+class TreeForm(ModelForm):
+    root: Node = Node()
+
+
+async def post_form(request):
+    return await SiteForm().validateForm(request=request)
+
+client = TestClient(Starlette(routes=[Route('/form', post_form, methods=['POST'])]))
+
+
+def test_nested_models_resolve_to_any_depth():
+    keys = list(SiteForm.form_layout().paths)
+    assert keys == [
+        'name', 'contact.tel', 'contact.email',
+        'site.tel', 'site.address.lot', 'site.address.street', 'site.address.parish', 'site.phones.0.tel',
+        'backup.tel', 'backup.address.lot', 'backup.address.street', 'backup.address.parish', 'backup.phones.0.tel',
+        ]
+    assert SiteForm.form_layout().paths['site.phones.0.tel'] == ('site', 'phones', 0, 'tel')
+    body = SiteForm().form_template(values=True)
+    for key in keys:
+        assert f'name="{key}" id="{key.replace(".", "-")}"' in body
+
+
+def test_recursive_models_are_cut():
+    assert list(TreeForm.form_layout().paths) == ['root.label']
+    assert TreeForm().form_template().count('name="root.label"') == 1
+
+
+def test_fragments_are_shared_between_forms():
+    SiteForm.render_plan()
+    digest = SiteForm.form_spec().defs['Address'].digest
+    HomeForm.render_plan()
+    assert HomeForm.form_spec().defs['Address'].digest == digest
+    assert len([key for key in FRAGMENTS if digest in key and key[3:6] == (False, False, False) and key[-2:] == (None, None)]) == 1
+    assert 'name="home.street"' in HomeForm().form_template()
+    assert 'name="site.address.street"' in SiteForm().form_template()
+
+
+def test_same_field_names_no_longer_collide():
+    data = {'csrf': 'tok', 'name': 'Al', 'contact.tel': '500', 'site.tel': '500', 'site.phones.0.tel': '5000'}
+    response = client.post('/form', data=data)
+    assert 'name="contact.tel" id="contact-tel" placeholder="Tel" required min="1" max="1000" step="1" value="500" /></label></fieldset>' in response.text
+    assert 'id="site-tel" placeholder="Tel" required min="1" max="99" step="1" value="500" /></label> <div class="text-xs text-red-500 font-semibold">Input should be less than or equal to 99</div>' in response.text
+    assert 'value="5000" /></label> <div class="text-xs text-red-500 font-semibold">Input should be less than or equal to 1000</div>' in response.text
+    payload = SiteForm.form_layout().payload(data)
+    assert payload['site']['phones'] == [{'tel': '5000'}]
+    assert payload['backup'] is None
+
+
+def test_blank_optional_sub_forms_stay_empty():
+    # every text input the browser posts, '' when left blank
+    names = re.findall(r'<input class="input[^>]*name="([^"]+)"', SiteForm().form_template(insert=True))
+    assert 'backup.address.street' in names and 'site.phones.0.tel' in names
+    filled = {'name': 'Al', 'contact.tel': '500', 'contact.email': 'al@example.com', 'site.tel': '50', 'site.address.lot': '5', 'site.address.street': 'Baker'}
+    data = {'csrf': 'tok', **{name: filled.get(name, '') for name in names}}
+    payload = SiteForm.form_layout().payload(data)
+    assert payload['backup'] is None and payload['site']['phones'] == []
+    response = client.post('/form', data=data)
+    assert 'Data Exchange' in response.text
+    # a sub form partly filled in is validated
+    response = client.post('/form', data={**data, 'backup.tel': '5'})
+    assert 'Data Exchange' not in response.text and 'String should have at least 3 characters' in response.text
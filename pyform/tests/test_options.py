@@ -0,0 +1,72 @@
+import json
+from typing import Any
+import pytest
+from pydantic import BaseModel, Field, ValidationError
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from pyform.models.form_models import ModelForm
+from pyform.models.options import OptionIndex
+
+CODES:list = [f"P{number:05d}" for number in range(20000)]
+DISTRICTS:list = ['Kingston 5', 'kingston 10', 'Spanish Town', 'May Pen']
+
+
+class Delivery(BaseModel):
+    district: Any = Field(default=None, title='District', json_schema_extra={'options': DISTRICTS, 'search': True})
+
+
+class OrderForm(ModelForm):
+    options_url = '/options'
+    product: Any = Field(default=None, title='Product', json_schema_extra={'options': CODES, 'search': True})
+    delivery: Delivery = Delivery()
+
+
+async def options(request):
+    return await OrderForm.options_response(request)
+
+client = TestClient(Starlette(routes=[Route('/options', options)]))
+
+
+def test_index_searches_prefixes_and_checks_membership():
+    index = OptionIndex(DISTRICTS)
+    assert index.search('king') == ['kingston 10', 'Kingston 5']
+    assert index.search('KING', start=1, count=5) == ['Kingston 5']
+    assert 'May Pen' in index and 'may pen' not in index and 'Mandeville' not in index
+
+
+def test_searchable_selects_render_a_typeahead():
+    body = OrderForm().form_template()
+    assert 'P00001' not in body and len(body) < 10000
+    assert 'name="delivery.district" id="delivery-district" list="delivery-district-options"' in body
+    assert 'hx-get="/options?field=delivery.district" hx-trigger="input changed delay:200ms" hx-target="#delivery-district-options" hx-params="delivery.district"' in body
+    assert '<datalist id="delivery-district-options"></datalist>' in body
+
+
+def test_options_route_pages_prefix_matches():
+    response = client.get('/options', params={'field': 'product', 'product': 'P0012', 'page': 1, 'size': 3})
+    assert response.text == '<option>P00123</option><option>P00124</option><option>P00125</option>'
+    assert client.get('/options', params={'field': 'delivery.district', 'q': 's'}).text == '<option>Spanish Town</option>'
+    assert client.get('/options', params={'field': 'nope'}).status_code == 400
+    assert client.get('/options', params={'field': 'product', 'size': 'x'}).status_code == 400
+
+
+def test_validation_checks_membership_against_the_index():
+    OrderForm.model_validate({'product': 'P19999', 'delivery': {'district': 'May Pen'}})
+    with pytest.raises(ValidationError) as info:
+        OrderForm.model_validate({'product': 'P20000', 'delivery': {'district': 'Mandeville'}})
+    assert {err['loc']: err['msg'] for err in info.value.errors()} == {
+        ('product',): 'Input should be one of the Product options',
+        ('delivery', 'district'): 'Input should be one of the District options',
+        }
+    assert OrderForm.validate_field('delivery.district', 'Mandeville') == 'Input should be one of the District options'
+    assert OrderForm.validate_field('product', 'P00042') is None
+    results = list(OrderForm.validate_batch([json.dumps({'product': 'X'}), {'product': 'P00001'}]))
+    assert results[0]['errors'] == {'product': 'Input should be one of the Product options'}
+    assert results[1]['ok']
+
+
+def test_unknown_field_names_are_not_reflected_as_html():
+    response = client.get('/options', params={'field': '<script>alert(1)</script>'})
+    assert response.status_code == 400
+    assert response.headers['content-type'].startswith('text/plain')
@@ -0,0 +1,83 @@
+import json
+from itertools import product
+from pathlib import Path
+import pytest
+from pyform.models.form_state import FormState
+from pyform.tests.test_models import MyForm
+
+SNAPSHOTS:dict = json.loads((Path(__file__).parent / 'snapshots' / 'my_form.json').read_text())
+
+FORM:dict = {'csrf': 'tok123', 'fields': {
+    'name': {'name': 'name', 'error': None, 'value': 'Al'},
+    'age': {'name': 'age', 'error': 'Value error, must be older than 3 !', 'value': '3'},
+    'contact.tel': {'name': 'contact.tel', 'error': 'Input should be less than or equal to 1000', 'value': '5000'},
+    'address.street': {'name': 'address.street', 'error': None, 'value': 'Baker'},
+}, 'model': None}
+
+VARIANTS = list(product([None, '/form'], [False, True], [False, True], [False, True]))
+
+
+def snapshot_name(post, insert, values, errors)->str:
+    return '-'.join([
+        'post' if post else 'nopost',
+        'insert' if insert else 'page',
+        'v' if values else 'nv',
+        'e' if errors else 'ne',
+        ])
+
+
+@pytest.mark.parametrize('post, insert, values, errors', VARIANTS)
+def test_plan_matches_generator_byte_for_byte(post, insert, values, errors):
+    target = 'form' if post else None
+    form = MyForm()
+    expected:str = SNAPSHOTS[snapshot_name(post, insert, values, errors)]
+    generated = ''.join(form.generate_html_form(post=post, target=target, insert=insert, form=FORM, values=values, errors=errors))
+    rendered = form.render_form(post=post, target=target, insert=insert, form=FORM, values=values, errors=errors)
+    assert generated == expected
+    assert rendered == expected.encode()
+
+
+def test_plan_is_compiled_once():
+    plan = MyForm.render_plan(post='/form', target='form', insert=True)
+    assert MyForm.render_plan(post='/form', target='form', insert=True) is plan
+    assert MyForm.render_plan(post='/form', target='form', insert=False) is not plan
+    assert [segment.kind for segment in plan.segments if not isinstance(segment, bytes)] == ['csrf', 'form']
+
+
+def test_default_form_renders_like_generator():
+    form = MyForm()
+    state = form.data_form()
+    assert form.html_form(form=state).body == ''.join(form.generate_html_form(form=state)).encode()
+
+
+def test_every_form_gets_a_fresh_csrf_token():
+    model = MyForm()
+    first, second = model.data_form(), model.data_form()
+    assert isinstance(first, FormState) and first.csrf != second.csrf
+    assert f'value="{first.csrf}"'.encode() in model.render_form(form=first)
+    assert model.data_form(csrf='tok').csrf == 'tok'
+
+
+def test_coalesce_merges_fragments_into_chunks():
+    from pyform.models.render_plan import coalesce
+    chunks = list(coalesce((b'x' * 10 for _ in range(100)), chunk_size=256))
+    assert b''.join(chunks) == b'x' * 1000
+    assert [len(chunk) for chunk in chunks] == [260, 260, 260, 220]
+
+
+def test_stream_html_form_sends_coalesced_chunks():
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+    from starlette.testclient import TestClient
+
+    sent:list = []
+
+    def stream(request):
+        response = MyForm().stream_html_form(form=FORM, values=True, errors=True, chunk_size=1024)
+        sent.extend(MyForm.render_plan(values=True, errors=True).chunks(FORM, chunk_size=1024))
+        return response
+
+    client = TestClient(Starlette(routes=[Route('/', stream)]))
+    body = client.get('/').content
+    assert body == SNAPSHOTS['nopost-page-v-e'].encode()
+    assert 1 < len(sent) < 10
@@ -0,0 +1,74 @@
+import subprocess
+import sys
+from pathlib import Path
+from pydantic import Field
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from pyform.models.form_models import ModelForm
+from pyform.response_cache import FormResponseCache
+from pyform.tests.test_models import MyForm
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+class OtherForm(ModelForm):
+    title: str = Field(default=None, title='Title')
+
+
+def make_client(cache:FormResponseCache)->TestClient:
+    async def form(request):
+        model = OtherForm() if request.query_params.get('other') else MyForm()
+        form = model.data_form(request=request, csrf=request.query_params.get('csrf', 'tok'))
+        return cache.form_response(request, model, form, post='/form', target='form', insert=True)
+    return TestClient(Starlette(routes=[Route('/form', form)]))
+
+
+def test_cached_form_matches_rendered_form_with_request_token():
+    cache = FormResponseCache()
+    client = make_client(cache)
+    model = MyForm()
+    for token in ('first', 'second'):
+        form = model.data_form(csrf=token)
+        response = client.get('/form', params={'csrf': token})
+        assert response.content == model.render_form(post='/form', target='form', insert=True, form=form)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_etag_revalidation():
+    client = make_client(FormResponseCache())
+    etag = client.get('/form').headers['etag']
+    assert etag.startswith('"')
+    response = client.get('/form', headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.content == b''
+    # another session's token yields another ETag
+    response = client.get('/form', params={'csrf': 'other'}, headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['etag'] != etag
+
+
+def test_lru_eviction():
+    cache = FormResponseCache(maxsize=1)
+    client = make_client(cache)
+    client.get('/form')
+    client.get('/form', params={'other': 1})
+    client.get('/form')
+    assert cache.stats() == {'hits': 0, 'misses': 3, 'evictions': 2, 'size': 1, 'maxsize': 1}
+
+
+def test_server_form_revalidates_within_a_session():
+    code = (
+        "import sys\n"
+        "sys.path.insert(0, 'pyform')\n"
+        "from starlette.testclient import TestClient\n"
+        "import server\n"
+        "with TestClient(server.app) as client:\n"
+        "    first = client.get('/form')\n"
+        "    second = client.get('/form')\n"
+        "    assert first.headers['etag'] == second.headers['etag']\n"
+        "    response = client.get('/form', headers={'If-None-Match': first.headers['etag']})\n"
+        "    assert response.status_code == 304, response.status_code\n"
+        "    # another session gets another token\n"
+        "    client.cookies.clear()\n"
+        "    assert client.get('/form').headers['etag'] != first.headers['etag']\n"
+        )
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
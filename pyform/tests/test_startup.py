@@ -0,0 +1,52 @@
+import subprocess
+import sys
+from pathlib import Path
+from pydantic import Field
+from pyform.models.form_models import ModelForm
+from pyform.models.form_spec import class_cache
+from pyform.models.registry import FORMS, registered_forms, warm_up
+from pyform.tests.test_models import MyForm
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def loaded_modules(code:str)->set:
+    output = subprocess.run([sys.executable, '-c', f"import sys\n{code}\nprint(' '.join(sys.modules))"], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return set(output.split())
+
+
+def test_validation_does_not_load_starlette_or_jinja():
+    modules = loaded_modules("from pyform.tests.test_models import MyForm\nMyForm.model_validate({'age': 33})\nimport pyform.config")
+    assert 'starlette' not in modules and 'jinja2' not in modules
+
+
+def test_subclasses_are_registered():
+    class Registered(ModelForm):
+        title: str = Field(default=None, title='Title')
+
+    assert FORMS[f"{__name__}.test_subclasses_are_registered.<locals>.Registered"] is Registered
+    assert MyForm in registered_forms()
+
+
+def test_warm_up_builds_the_caches():
+    class Cold(ModelForm):
+        title: str = Field(default=None, title='Title')
+
+    assert warm_up([Cold], post='/form', target='form', insert=True) == [Cold]
+    cache = class_cache(Cold)
+    assert {'spec', 'layout', 'field_validators'} <= cache.keys()
+    assert ('plan', '/form', 'form', True, True, True, None, None) in cache
+    assert Cold in warm_up()
+
+
+def test_server_warms_up_on_startup():
+    modules = loaded_modules(
+        "sys.path.insert(0, 'pyform')\n"
+        "from starlette.testclient import TestClient\n"
+        "import server\n"
+        "from pyform.models.form_spec import class_cache\n"
+        "assert 'jinja2' not in sys.modules\n"
+        "with TestClient(server.app):\n"
+        "    assert 'spec' in class_cache(server.MyForm)\n"
+        )
+    assert 'jinja2' in modules
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from pyform.models import uploads
+from pyform.models.form_models import ModelForm
+from pyform.models.uploads import UploadedFile, UploadTooLarge, read_form
+
+SEEN:list = []
+
+
+class Papers(BaseModel):
+    scan: Optional[UploadedFile] = Field(default=None, title='Scan', json_schema_extra={'file': True, 'max_size': 2048})
+
+
+class ClaimForm(ModelForm):
+    max_upload_size = 64 * 1024
+    name: str = Field(default=None, title='Name')
+    receipt: Optional[UploadedFile] = Field(default=None, title='Receipt', json_schema_extra={'file': True, 'accept': 'application/pdf'})
+    papers: Papers = Papers()
+
+    @field_validator('receipt')
+    @classmethod
+    def check_receipt(cls, value):
+        if value is not None:
+            # a file handle, not the posted bytes
+            SEEN.append((value.filename, value.file.read(), value.file._rolled))
+            if not value.filename.endswith('.pdf'):
+                raise ValueError('must be a pdf')
+        return value
+
+
+async def post(request):
+    return await ClaimForm().validateForm(request=request, json_data=True)
+
+client = TestClient(Starlette(routes=[Route('/form', post, methods=['POST'])]))
+
+
+def test_upload_forms_render_multipart_file_inputs():
+    body = ClaimForm().form_template(post='/form', target='form')
+    assert '<form method="POST" enctype="multipart/form-data" hx-post="/form" hx-target="#form">' in body
+    assert 'type="file" name="receipt" id="receipt" accept="application/pdf" />' in body
+    assert 'type="file" name="papers.scan" id="papers-scan" />' in body
+    assert ClaimForm.upload_limits() == {'receipt': uploads.UPLOAD_MAX_SIZE, 'papers.scan': 2048}
+
+
+def test_validation_gets_spooled_file_handles(monkeypatch):
+    monkeypatch.setattr(uploads, 'UPLOAD_SPOOL_SIZE', 1024)
+    SEEN.clear()
+    response = client.post('/form', data={'name': 'Al'}, files={'receipt': ('r.pdf', b'%PDF' * 1000, 'application/pdf')})
+    assert response.status_code == 200
+    assert response.json() == {'name': 'Al', 'receipt': 'r.pdf', 'papers': {'scan': None}}
+    # larger than the spool size, on disk
+    assert SEEN == [('r.pdf', b'%PDF' * 1000, True)]
+    response = client.post('/form', data={'name': 'Al'}, files={'receipt': ('r.txt', b'text', 'text/plain')})
+    assert 'must be a pdf' in response.text
+
+
+def test_empty_file_inputs_are_not_sent():
+    response = client.post('/form', data={'name': 'Al'}, files={'receipt': ('', b'', 'application/octet-stream')})
+    assert response.json()['receipt'] is None
+
+
+def test_oversized_uploads_are_rejected():
+    response = client.post('/form', files={'papers.scan': ('s.png', b'x' * 2049, 'image/png')})
+    assert response.status_code == 413 and response.text == 'papers.scan exceeds the upload limit of 2048 bytes'
+    response = client.post('/form', files={'receipt': ('r.pdf', b'x' * 70000, 'application/pdf')})
+    assert response.status_code == 413 and response.text.startswith('the form exceeds')
+
+
+def test_oversized_part_names_are_not_reflected_as_html(monkeypatch):
+    monkeypatch.setattr(uploads, 'UPLOAD_MAX_FIELD_SIZE', 1024)
+    key = '<img src=x onerror=alert(1)>'
+    response = client.post('/form', files={key: (None, b'x' * 1025)})
+    assert response.status_code == 413
+    assert response.headers['content-type'].startswith('text/plain')
+    assert response.text == f"{key} exceeds the upload limit of 1024 bytes"
+
+
+def test_content_length_is_checked_before_the_body_is_read():
+    class Request:
+        headers = {'content-length': f"{10 ** 9}", 'content-type': 'multipart/form-data; boundary=x'}
+
+        async def stream(self):
+            raise AssertionError('the body was read')
+            yield b''
+
+    try:
+        asyncio.run(read_form(Request(), ClaimForm.upload_limits(), ClaimForm.max_upload_size))
+    except UploadTooLarge as e:
+        assert e.key == 'the form' and e.limit == 64 * 1024
+    else:
+        raise AssertionError('not rejected')
@@ -0,0 +1,101 @@
+from starlette.applications import Starlette
+from starlette.responses import HTMLResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from pyform.tests.test_models import MyForm
+
+
+async def post_form(request):
+    return await MyForm().validateForm(request=request, schema=MyForm)
+
+client = TestClient(Starlette(routes=[Route('/form', post_form, methods=['POST'])]))
+
+
+def test_layout_maps_dotted_keys_to_model_paths():
+    layout = MyForm.form_layout()
+    assert layout.paths['age'] == ('age',)
+    assert layout.paths['contact.tel'] == ('contact', 'tel')
+    payload = layout.payload({'name': 'Al', 'contact.tel': '5', 'address.street': 'Baker'})
+    assert payload == {
+        'name': 'Al', 'age': None, 'is_admin': None, 'volume': None,
+        'contact': {'tel': '5', 'email': None},
+        'address': {'lot': None, 'street': 'Baker', 'parish': None},
+        }
+
+
+def test_invalid_post_renders_every_field_error():
+    data = {'csrf': 'tok', 'name': 'Al', 'age': '3', 'is_admin': 'true', 'volume': '2', 'contact.tel': '5000'}
+    response = client.post('/form', data=data)
+    fields = {key: {'name': key, 'error': None, 'value': value} for key, value in data.items() if key != 'csrf'}
+    fields['age']['error'] = 'Value error, must be older than 3 !'
+    fields['contact.tel']['error'] = 'Input should be less than or equal to 1000'
+    # the submitted values, shaped like the model
+    form = {'csrf': 'tok', 'fields': fields, 'model': MyForm.form_layout().payload(data)}
+    assert response.content == MyForm().render_form(post='/form', target='form', insert=True, form=form, values=True, errors=True)
+
+
+def test_valid_post_returns_the_model():
+    data = {
+        'csrf': 'tok', 'name': 'Al', 'age': '33', 'is_admin': 'true', 'volume': '2',
+        'contact.tel': '500', 'contact.email': 'al@example.com',
+        'address.lot': '5', 'address.street': 'Baker', 'address.parish': 'kingston',
+        }
+    response = client.post('/form', data=data)
+    assert response.status_code == 200
+    assert "name='Al' age=33" in response.text
+
+
+async def post_fragments(request):
+    return await MyForm().validateForm(request=request, schema=MyForm, fragments=True)
+
+fragment_client = TestClient(Starlette(routes=[Route('/form', post_fragments, methods=['POST'])]))
+
+TEXT_FIELDS:dict = {'name': 'Al', 'age': '33', 'contact.tel': '500', 'contact.email': 'al@example.com', 'address.lot': '5', 'address.street': 'Baker'}
+
+
+def test_invalid_post_swaps_only_changed_fieldsets():
+    response = fragment_client.post('/form', data={**TEXT_FIELDS, 'csrf': 'tok', 'age': '3', '_invalid': 'name'})
+    assert response.headers['hx-reswap'] == 'none'
+    body = response.text
+    assert body.count('hx-swap-oob="true"') == 3
+    assert '<fieldset class="fieldset" id="age-fieldset" hx-swap-oob="true">' in body
+    assert 'must be older than 3 !' in body
+    # name had an error before and is valid now, its fieldset is cleared
+    assert '<fieldset class="fieldset" id="name-fieldset" hx-swap-oob="true">' in body
+    assert 'id="contact-tel-fieldset"' not in body and 'Form Data' not in body
+    assert '<input type="hidden" name="_invalid" id="_invalid" value="age" hx-swap-oob="true" />' in body
+
+
+def test_fragments_fall_back_to_full_render_when_fields_differ():
+    response = fragment_client.post('/form', data={'csrf': 'tok', 'name': 'Al', 'age': '3'})
+    assert 'hx-reswap' not in response.headers
+    assert 'Form Data' in response.text
+    assert '<input type="hidden" name="_invalid" id="_invalid" value="age" />' in response.text
+
+
+def test_error_fragments_flow_from_the_served_form():
+    import re
+
+    async def form(request):
+        if request.method == 'POST':
+            return await post_fragments(request)
+        return HTMLResponse(MyForm().render_form(post='/form', target='form', insert=True))
+
+    flow_client = TestClient(Starlette(routes=[Route('/form', form, methods=['GET', 'POST'])]))
+
+    def invalid(body:str)->str:
+        # the value the browser holds after the page load or the out of band swap
+        return re.search(r'<input type="hidden" name="_invalid" id="_invalid" value="([^"]*)"', body).group(1)
+
+    page = flow_client.get('/form').text
+    state = invalid(page)
+    assert state == ''
+    response = flow_client.post('/form', data={**TEXT_FIELDS, 'csrf': 'tok', 'age': '3', '_invalid': state})
+    assert 'must be older than 3 !' in response.text
+    state = invalid(response.text)
+    assert state == 'age'
+    response = flow_client.post('/form', data={**TEXT_FIELDS, 'csrf': 'tok', 'name': 'A', '_invalid': state})
+    # age is valid again, its fieldset is cleared
+    assert '<fieldset class="fieldset" id="age-fieldset" hx-swap-oob="true">' in response.text
+    assert 'must be older' not in response.text
+    assert invalid(response.text) == 'name'